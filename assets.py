@@ -0,0 +1,114 @@
+"""
+Process-wide asset registry for PyDoom. Every sprite sheet and texture is read from disk once and shared by everything that uses it.
+"""
+
+from dataclasses import dataclass
+import os
+import threading
+from typing import Tuple
+import numpy as np
+from image_utils import PngInfo, decode_png, read_png_info, scan_png_directory
+
+ASSET_DIRECTORY = 'assets'
+MANIFEST_PATH = os.path.join(ASSET_DIRECTORY, 'manifest.json')
+
+@dataclass(frozen=True)
+class SpriteFrame:
+    """Class to hold sprite frame data shared by every enemy of a type."""
+    path: str
+    width: int
+    height: int
+
+_sprite_sheets = {}
+_textures = {}
+_display_images = {}
+_image_info = None
+_image_info_lock = threading.Lock()
+# Guards the caches above, files are decoded outside it so worker threads decode in parallel
+_cache_lock = threading.Lock()
+
+def get_image_info(filepath: str) -> PngInfo:
+    """Get a PNG's metadata, probing the asset directory through its manifest on first use.
+
+    Args:
+        filepath: Path to the PNG file
+
+    Returns:
+        The image's dimensions, bit depth and color type
+    """
+    global _image_info
+    # The preloader probes from several threads, only one of them scans and rewrites the manifest
+    with _image_info_lock:
+        if _image_info is None:
+            _image_info = scan_png_directory(ASSET_DIRECTORY, MANIFEST_PATH) if os.path.isdir(ASSET_DIRECTORY) else {}
+    info = _image_info.get(os.path.normpath(filepath))
+    if info is None:
+        info = read_png_info(filepath)
+        _image_info[os.path.normpath(filepath)] = info
+    return info
+
+def get_sprite_sheet(name: str, frame_count: int) -> Tuple[SpriteFrame, ...]:
+    """Get the animation frames stored as assets/<name>/frame<i>.png, probing each file only once.
+
+    Args:
+        name: Sprite sheet directory under assets
+        frame_count: Number of frames in the sheet
+
+    Returns:
+        Tuple of frames in animation order
+    """
+    with _cache_lock:
+        sheet = _sprite_sheets.get(name)
+    if sheet is None:
+        frames = []
+        for i in range(frame_count):
+            filepath = f'assets/{name}/frame{i}.png'
+            info = get_image_info(filepath)
+            frames.append(SpriteFrame(filepath, info.width, info.height))
+        with _cache_lock:
+            sheet = _sprite_sheets.setdefault(name, tuple(frames))
+    return sheet
+
+def get_texture(filepath: str) -> np.ndarray:
+    """Get the decoded RGBA pixels of an image, decoding each file only once.
+
+    Args:
+        filepath: Path to the PNG file
+
+    Returns:
+        uint8 array of shape (height, width, 4), shared between callers so it must not be modified
+    """
+    with _cache_lock:
+        texture = _textures.get(filepath)
+    if texture is None:
+        texture = decode_png(filepath)
+        texture.flags.writeable = False
+        with _cache_lock:
+            texture = _textures.setdefault(filepath, texture)
+    return texture
+
+def get_display_image(filepath: str):
+    """Get an image decoded for cmu_graphics, decoding each file only once.
+
+    Decoding doesn't touch the window, so this can run on a worker thread and
+    leave the main thread only the Image shapes to create.
+
+    Args:
+        filepath: Path to the image file
+
+    Returns:
+        cmu_graphics.CMUImage to pass as an Image's url, shared between callers
+    """
+    with _cache_lock:
+        image = _display_images.get(filepath)
+    if image is None:
+        # Imported here so the game logic can run without cmu_graphics or Pillow
+        from cmu_graphics import CMUImage
+        from PIL import Image as PILImage
+        with PILImage.open(filepath) as source:
+            image = CMUImage(source.convert('RGBA'))
+        # Converts the pixels to what cmu_graphics draws from now, instead of when the first Image is made
+        image.params
+        with _cache_lock:
+            image = _display_images.setdefault(filepath, image)
+    return image
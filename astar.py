@@ -1,87 +1,88 @@
 import constants
 import utils
-from sortedcontainers import SortedDict
+import game_map
+import heapq
+import math
 
-def find_path(from_pos, to):
-    """Returns a path from one positino to another using A* search. if no path is finds it returns None."""
+DIAGONAL_COST = math.sqrt(2)
+
+def find_path(from_pos, to, bounds=None):
+    """Returns a path from one position to another using A* search, including both ends. if no path is found it returns None.
+
+    bounds is an optional (left, top, right, bottom) box of cells, right and bottom exclusive, that the path has to stay inside."""
     from_pos = (int(from_pos[0]), int(from_pos[1]))
     to = (int(to[0]), int(to[1]))
-    
-    goals = set()
-    goals.add(utils.pack(to))
 
-    costs = {}
-    for x in range(constants.MAP_DIMENSIONS):
-        for y in range(constants.MAP_DIMENSIONS):
-            costs[utils.pack((x, y))] = constants.MAP[x][y].cost()
+    world = game_map.current_map()
+    width = world.width
+    left, top, right, bottom = bounds if bounds is not None else (0, 0, width, world.height)
+
+    if not (left <= from_pos[0] < right and top <= from_pos[1] < bottom and left <= to[0] < right and top <= to[1] < bottom):
+        return None
 
-    visited = set()
-    visited.add(utils.pack(from_pos))
+    costs = world.cost_table()
+    start = utils.pack(from_pos)
+    goal = utils.pack(to)
 
+    if costs[goal] == None:
+        return None
+
+    g_scores = {start: 0}
     from_positions = {}
+    closed = set()
 
-    open_set = SortedDict()
-    open_set[utils.pack(from_pos)] = g_score(from_pos, goals)
+    open_set = [(h_score(from_pos, to), 0, start)]
 
     while len(open_set) > 0:
-        unpacked_pos = open_set.popitem(0)
-        pos = utils.unpack(unpacked_pos[0])
+        _, g_score, packed = heapq.heappop(open_set)
 
-        for offset in constants.ADJACENT_OFFSETS:
-            adj_pos = (pos[0] + offset[0], pos[1] + offset[1])
+        if packed == goal:
+            return construct_path(to, from_positions)
 
-            packed = utils.pack(adj_pos)
-            
-            if packed in visited:
-                continue
-            
-            visited.add(packed)
+        # Skip stale entries left behind when a cheaper route was found
+        if packed in closed:
+            continue
+        closed.add(packed)
 
-            if not utils.is_inside_map(adj_pos):
-                continue
-            
-            if adj_pos == from_pos:
-                continue
+        pos = (packed % width, packed // width)
 
-            if packed in goals:
-                from_positions[packed] = pos
-                return construct_path(adj_pos, from_positions)
+        for offset in constants.ADJACENT_OFFSETS:
+            adj_pos = (pos[0] + offset[0], pos[1] + offset[1])
 
-            if costs[packed] == None:
+            if not (left <= adj_pos[0] < right and top <= adj_pos[1] < bottom):
                 continue
 
-            score = f_score(adj_pos, from_positions, goals)
-            open_set[packed] = score
-            from_positions[packed] = pos
-    return None
+            adj_packed = adj_pos[1] * width + adj_pos[0]
 
-def f_score(pos, from_positions, goals):
-    h_score(pos, from_positions) + g_score(pos, goals)
+            if adj_packed in closed or costs[adj_packed] == None:
+                continue
 
-def h_score(pos, from_positions):
-    return len(construct_path(pos, from_positions))
+            step_cost = costs[adj_packed] * (DIAGONAL_COST if offset[0] and offset[1] else 1)
+            score = g_score + step_cost
 
-def g_score(pos, goals):
-    """Finds the g-sore for a position: the nearest distance to a goal"""
-    goal_pos = None
-    min_score = float('inf')
-    for goal in goals:
-        goal_pos = utils.unpack(goal)
-        min_score = min(min_score, utils.distance(pos, goal_pos))
+            if score < g_scores.get(adj_packed, math.inf):
+                g_scores[adj_packed] = score
+                from_positions[adj_packed] = pos
+                heapq.heappush(open_set, (score + h_score(adj_pos, to), score, adj_packed))
+    return None
 
-    return min_score
+def h_score(pos, goal):
+    """Finds the h-score for a position: the octile distance to the goal, which never overestimates an 8-way path."""
+    dx = abs(pos[0] - goal[0])
+    dy = abs(pos[1] - goal[1])
+    return dx + dy + (DIAGONAL_COST - 2) * min(dx, dy)
 
 def construct_path(to, from_positions):
     """Returns a constructed path going backwards from the end position to the start position."""
-    path = []
+    path = [to]
     previous = to
 
     while from_positions.get(utils.pack(previous), None) != None:
-        
+
         pos = from_positions[utils.pack(previous)]
-        
+
         path.append(pos)
         previous = pos
-        
+
     path.reverse()
-    return path
\ No newline at end of file
+    return path
@@ -0,0 +1,303 @@
+"""
+Deterministic headless benchmarks for PyDoom's rendering and AI hot paths.
+
+Runs ray_cast, run_world, render_sprite, project_enemies, astar.find_path and move_enemies
+along a scripted player path on generated levels of several sizes, at
+several RESOLUTION values and enemy counts, then writes the timings as
+JSON and compares them against a stored baseline. HPA* is timed both cold,
+building its cluster graph as it goes, and warm, after a full build.
+
+    python bench.py                          run everything, compare with bench_baseline.json if it exists
+    python bench.py --quick                  fewer configurations and frames
+    python bench.py --save-baseline          store this run as the new baseline
+    python bench.py --tolerance 0.2          fail when anything is more than 20% slower than the baseline
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+
+import astar
+import constants
+import doom
+import game_map
+import hpa
+import levels
+
+RESULTS_VERSION = 1
+SEED = 1234
+
+# Keys held on each step of the scripted player path, repeated as long as needed
+PLAYER_SCRIPT = [{'w'}] * 12 + [{'w', 'right'}] * 4 + [{'right'}] * 3 + [{'w'}] * 8 + [{'a', 'left'}] * 5 + [{'s'}] * 4
+
+FULL_CONFIG = {
+    'map_sizes': [10, 64, 256],
+    'resolutions': [1, 3, 6],
+    'enemy_counts': [1, 10, 50],
+    'frames': 60,
+    'calls': 2000,
+}
+QUICK_CONFIG = {
+    'map_sizes': [10, 64],
+    'resolutions': [3],
+    'enemy_counts': [1, 10],
+    'frames': 20,
+    'calls': 500,
+}
+
+def make_level(size: int, enemies: int) -> game_map.GameMap:
+    """Build a deterministic level, using the built-in map for size 10.
+
+    Args:
+        size: Width and height of the level
+        enemies: Number of Imp spawns
+
+    Returns:
+        The level
+    """
+    if size != len(constants.MAP):
+        return levels.generate_level(size, size, enemies=enemies, seed=SEED + size)
+
+    world = game_map.GameMap.from_rows(constants.MAP)
+    world.player_start = (1.5, 1.5)
+    empty = [(x, y) for y in range(world.height) for x in range(world.width)
+             if world.is_passable(x, y) and (x, y) != (1, 1)]
+    picker = random.Random(SEED)
+    world.spawns = [(x, y, 'imp') for x, y in picker.sample(empty, min(enemies, len(empty)))]
+    return world
+
+def scripted_poses(steps: int):
+    """Walk the player along the scripted path from its current position.
+
+    Args:
+        steps: Number of steps to take
+
+    Yields:
+        Nothing, the player is moved before each step is yielded
+    """
+    for step in range(steps):
+        keys = PLAYER_SCRIPT[step % len(PLAYER_SCRIPT)]
+        doom.handle_movement(keys)
+        doom.handle_rotation(keys)
+        yield step
+
+def summarize(samples: list, calls_per_sample: int = 1) -> dict:
+    """Turn raw sample durations into latency statistics.
+
+    Args:
+        samples: Durations in seconds
+        calls_per_sample: Number of calls each sample covered
+
+    Returns:
+        Dictionary with per-call latencies in milliseconds and calls per second
+    """
+    per_call = sorted(sample / calls_per_sample for sample in samples)
+    mean = statistics.fmean(per_call)
+    return {
+        'calls': len(samples) * calls_per_sample,
+        'mean_ms': mean * 1000,
+        'p50_ms': per_call[len(per_call) // 2] * 1000,
+        'p95_ms': per_call[min(len(per_call) - 1, math.ceil(0.95 * len(per_call)) - 1)] * 1000,
+        'per_second': 1 / mean if mean else math.inf,
+    }
+
+def bench_ray_cast(calls: int) -> dict:
+    """Time single ray casts spread around the player."""
+    samples = []
+    for i, _ in enumerate(scripted_poses(calls)):
+        angle = doom.player.angle + (i * 0.37) % (math.pi / 2) - math.pi / 4
+        start = time.perf_counter()
+        doom.ray_cast(angle)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_run_world(frames: int, renderer: str) -> dict:
+    """Time whole rendered frames while the player walks the scripted path."""
+    doom.RENDERER = renderer
+    samples = []
+    for _ in scripted_poses(frames):
+        start = time.perf_counter()
+        doom.run_world()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_render_sprite(calls: int) -> dict:
+    """Time sprite projection for every enemy while the player walks the scripted path."""
+    enemies = constants.ENEMY_MAP
+    samples = []
+    for _ in scripted_poses(max(1, calls // max(1, len(enemies)))):
+        start = time.perf_counter()
+        for enemy in enemies:
+            doom.render_sprite(enemy)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, max(1, len(enemies)))
+
+def bench_project_enemies(calls: int) -> dict:
+    """Time batched projection of every enemy while the player walks the scripted path."""
+    samples = []
+    for _ in scripted_poses(calls):
+        start = time.perf_counter()
+        doom.project_enemies()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_find_path(calls: int, find_path=astar.find_path) -> dict:
+    """Time path searches between random pairs of empty cells, A* unless another search is given."""
+    world = game_map.current_map()
+    empty = [(int(x), int(y)) for y, x in zip(*(world.tiles == constants.PosColor.EMPTY.value).nonzero())]
+    picker = random.Random(SEED)
+    pairs = [(picker.choice(empty), picker.choice(empty)) for _ in range(calls)]
+    samples = []
+    for from_pos, to in pairs:
+        start = time.perf_counter()
+        find_path(from_pos, to)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_hpa_build(calls: int) -> dict:
+    """Time building the whole HPA* cluster graph of the current map from scratch, as build() without a budget does."""
+    samples = []
+    for _ in range(calls):
+        path_finder = hpa.HierarchicalPathfinder()
+        start = time.perf_counter()
+        path_finder.build()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_hpa_find_path(calls: int, cold: bool) -> dict:
+    """Time HPA* searches between random pairs of empty cells.
+
+    Args:
+        calls: Number of searches
+        cold: Give every search a fresh pathfinder, so it builds the clusters it reaches, instead of one
+            pathfinder built up front
+    """
+    if cold:
+        return bench_find_path(calls, lambda from_pos, to: hpa.HierarchicalPathfinder().find_path(from_pos, to))
+    path_finder = hpa.HierarchicalPathfinder()
+    path_finder.build()
+    return bench_find_path(calls, path_finder.find_path)
+
+def bench_move_enemies(ticks: int, pathfinding: str) -> dict:
+    """Time AI ticks that move every enemy one step, while the player walks the scripted path.
+
+    HPA* is timed with its cluster graph already built, its build is timed by bench_hpa_build.
+    """
+    doom.PATHFINDING = pathfinding
+    if pathfinding == 'hpa':
+        doom.enemy_pathfinding.path_finder.build()
+    samples = []
+    for _ in scripted_poses(ticks):
+        # move_enemies only plans every tenth call, so always land on a planning tick
+        doom.enemies_current_frame = 9
+        start = time.perf_counter()
+        doom.move_enemies()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def run_benchmarks(config: dict) -> dict:
+    """Run every benchmark in a configuration.
+
+    Args:
+        config: Map sizes, resolutions, enemy counts, frames and calls to run
+
+    Returns:
+        Dictionary from benchmark name to its statistics
+    """
+    results = {}
+    # Every entry sets the quality it measures, so the adaptive controller must not move it
+    doom.ADAPTIVE_QUALITY = False
+    doom.SPRITE_CAP = None
+
+    def run(name: str, size: int, enemies: int, benchmark, *args) -> None:
+        doom.start_level(make_level(size, enemies))
+        results[name] = benchmark(*args)
+        print(f"{name:<60} {results[name]['mean_ms']:9.4f} ms  {results[name]['per_second']:10.1f}/s")
+
+    for size in config['map_sizes']:
+        run(f'ray_cast/map={size}', size, 0, bench_ray_cast, config['calls'])
+        run(f'find_path/map={size}', size, 0, bench_find_path, max(1, config['calls'] // 10))
+        run(f'hpa_build/map={size}', size, 0, bench_hpa_build, max(1, config['calls'] // 500))
+        run(f'find_path/hpa/cold/map={size}', size, 0, bench_hpa_find_path, max(1, config['calls'] // 100), True)
+        run(f'find_path/hpa/map={size}', size, 0, bench_hpa_find_path, max(1, config['calls'] // 10), False)
+        for resolution in config['resolutions']:
+            doom.RESOLUTION = resolution
+            for renderer in ('shapes', 'framebuffer'):
+                run(f'run_world/{renderer}/map={size}/resolution={resolution}', size, 1, bench_run_world, config['frames'], renderer)
+        doom.RESOLUTION = 3
+        doom.RENDERER = 'shapes'
+        for enemies in config['enemy_counts']:
+            run(f'render_sprite/map={size}/enemies={enemies}', size, enemies, bench_render_sprite, config['calls'])
+            run(f'project_enemies/map={size}/enemies={enemies}', size, enemies, bench_project_enemies, config['calls'])
+            for pathfinding in ('astar', 'flowfield', 'hpa'):
+                run(f'move_enemies/{pathfinding}/map={size}/enemies={enemies}', size, enemies, bench_move_enemies,
+                    config['frames'], pathfinding)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Find benchmarks that got slower than the baseline.
+
+    Args:
+        results: Current results
+        baseline: Stored baseline results
+        tolerance: Allowed slowdown as a fraction, 0.15 allows 15%
+
+    Returns:
+        List of (name, baseline ms, current ms) for every regression
+    """
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        if previous and stats['mean_ms'] > previous['mean_ms'] * (1 + tolerance):
+            regressions.append((name, previous['mean_ms'], stats['mean_ms']))
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark PyDoom without a window.')
+    parser.add_argument('--quick', action='store_true', help='run fewer configurations and frames')
+    parser.add_argument('--output', default='bench_results.json', help='where to write the results')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='baseline results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown before failing, as a fraction')
+    args = parser.parse_args()
+
+    config = QUICK_CONFIG if args.quick else FULL_CONFIG
+    results = run_benchmarks(config)
+
+    report = {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': config,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before:.4f} ms -> {after:.4f} ms ({(after / before - 1) * 100:+.0f}%)")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Camera projection tables for PyDoom. Everything that depends only on the screen, resolution and field of view is
+computed once, so projecting a frame needs no per-column trigonometry.
+"""
+
+import math
+from typing import Tuple
+import numpy as np
+
+class Camera:
+    """Per-column ray offsets and fisheye corrections for one screen layout."""
+
+    def __init__(self, screen_width: int, screen_height: int, column_width: int, fov: float = math.pi / 2,
+                 wall_height_mod: int = 2, player_height_mod: int = 2):
+        """Build the tables for a screen layout.
+
+        Args:
+            screen_width: Screen width in pixels
+            screen_height: Screen height in pixels
+            column_width: Width of each wall column in pixels
+            fov: Horizontal field of view in radians
+            wall_height_mod: Divisor for the part of a wall above the horizon
+            player_height_mod: Divisor for the part of a wall below the horizon
+        """
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.column_width = column_width
+        self.fov = fov
+        self.wall_height_mod = wall_height_mod
+        self.player_height_mod = player_height_mod
+
+        # Each column's ray is turned this far clockwise from the view direction, matching
+        # atan(0.5 - (column + 0.5) / (screen_width / 2)) at a 90 degree field of view
+        columns = np.arange(0, screen_width, column_width, dtype=np.float64)
+        self.offsets = np.arctan(math.tan(fov / 2) * (0.5 - (columns + 0.5) / (screen_width / 2)))
+        self.cos_offsets = np.cos(self.offsets)
+        self.sin_offsets = np.sin(self.offsets)
+
+    def matches(self, screen_width: int, screen_height: int, column_width: int, fov: float) -> bool:
+        """Check whether the tables were built for a screen layout."""
+        return (self.screen_width, self.screen_height, self.column_width, self.fov) == (screen_width, screen_height, column_width, fov)
+
+    def column_angles(self, angle: float) -> np.ndarray:
+        """Get the angle of every column's ray for a view direction."""
+        return angle - self.offsets
+
+    def ray_directions(self, angle: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the unit direction of every column's ray by rotating the precomputed offsets.
+
+        Args:
+            angle: View direction
+
+        Returns:
+            Tuple of (x components, y components)
+        """
+        cos_angle = math.cos(angle)
+        sin_angle = math.sin(angle)
+        return (cos_angle * self.cos_offsets + sin_angle * self.sin_offsets,
+                sin_angle * self.cos_offsets - cos_angle * self.sin_offsets)
+
+    def project_walls(self, distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Turn ray distances into wall columns, the same way as calculate_wall_dimensions in doom.py.
+
+        Args:
+            distances: Distance to the wall along every column's ray
+
+        Returns:
+            Tuple of (fisheye corrected depths, wall tops, wall bottoms) arrays
+        """
+        depths = distances * self.cos_offsets
+        heights = np.minimum(self.screen_height, (self.screen_height / depths).astype(np.int64))
+        horizon = self.screen_height // 2
+        tops = np.maximum(0, horizon - heights // self.wall_height_mod)
+        bottoms = np.minimum(self.screen_height, horizon + heights // self.player_height_mod)
+        return depths, tops, bottoms
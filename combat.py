@@ -0,0 +1,98 @@
+"""
+Hit detection for PyDoom's hitscan weapon. Walks a shot's ray through the map and tests the enemies indexed around
+each cell it crosses, so a shot costs one ray walk no matter how many enemies there are.
+"""
+
+import math
+from typing import Callable, Optional
+import constants
+import raycast
+
+def billboard_radius(width: int, height: int, screen_width: int, screen_height: int, fov: float) -> float:
+    """Get the half-width in map units of a sprite drawn as a billboard.
+
+    A billboard of drawn width screen_height * aspect / distance, over fov
+    radians of screen_width pixels, spans the same number of map units at
+    any distance.
+
+    Args:
+        width: Width of the sprite frame in pixels
+        height: Height of the sprite frame in pixels
+        screen_width: Screen width in pixels
+        screen_height: Screen height in pixels
+        fov: Horizontal field of view in radians
+
+    Returns:
+        Radius of the circle the sprite covers on the map
+    """
+    return screen_height * width / height * fov / (2 * screen_width)
+
+def hit_distance(enemy, radius: float, origin_x: float, origin_y: float, dir_x: float, dir_y: float) -> Optional[float]:
+    """Get how far along a ray it first touches an enemy, treated as a circle centred half a cell past its position.
+
+    Args:
+        enemy: The enemy to test
+        radius: Radius of the enemy's circle
+        origin_x: X coordinate of the ray origin
+        origin_y: Y coordinate of the ray origin
+        dir_x: X component of the ray's unit direction
+        dir_y: Y component of the ray's unit direction
+
+    Returns:
+        Distance from the origin, 0 if the origin is inside the circle, or None if the ray misses
+    """
+    to_x = enemy.x + 0.5 - origin_x
+    to_y = enemy.y + 0.5 - origin_y
+    along = to_x * dir_x + to_y * dir_y
+    miss = to_x * to_x + to_y * to_y - along * along
+    if miss > radius * radius:
+        return None
+    half_chord = math.sqrt(radius * radius - miss)
+    if along + half_chord < 0:
+        return None
+    return max(0.0, along - half_chord)
+
+def find_target(world, index, origin_x: float, origin_y: float, angle: float, max_distance: float,
+                radius: Callable[[object], float], max_radius: float):
+    """Find the nearest enemy a shot crosses in front of the first wall it hits.
+
+    Args:
+        world: Map the shot is fired in
+        index: SpatialHash of the enemies
+        origin_x: X coordinate the shot is fired from
+        origin_y: Y coordinate the shot is fired from
+        angle: Angle to fire at
+        max_distance: Furthest the shot reaches
+        radius: Function giving the radius of an enemy's circle, see billboard_radius
+        max_radius: Largest radius it gives for any enemy in the index
+
+    Returns:
+        The enemy that gets hit, or None if the shot hits a wall or nothing
+    """
+    empty = constants.PosColor.EMPTY.value
+    origin = (int(origin_x), int(origin_y))
+    dir_x, dir_y = math.cos(angle), math.sin(angle)
+    # An enemy indexed in cell x covers x + 0.5 - radius to x + 0.5 + radius, so only enemies indexed
+    # within these offsets of a cell can cover part of it
+    offsets = range(math.floor(-0.5 - max_radius), math.floor(0.5 + max_radius) + 1)
+    checked = set()
+    target, target_distance = None, math.inf
+
+    for cell_x, cell_y, entry in raycast.walk_cells(origin_x, origin_y, angle, max_distance):
+        # Every enemy crossing the ray before this cell has been found by now
+        if entry > target_distance:
+            return target
+        if not world.contains(cell_x, cell_y):
+            return None
+        if (cell_x, cell_y) != origin and world.value(cell_x, cell_y) != empty:
+            return None
+
+        cells = [(cell_x + dx, cell_y + dy) for dy in offsets for dx in offsets]
+        for enemy in index.in_cells(cells):
+            if enemy in checked:
+                continue
+            checked.add(enemy)
+            distance = hit_distance(enemy, radius(enemy), origin_x, origin_y, dir_x, dir_y)
+            if distance is not None and distance < target_distance:
+                target, target_distance = enemy, distance
+    return target
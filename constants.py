@@ -11,7 +11,6 @@ ADJACENT_OFFSETS = [
     (-1, -1),
 ]
 
-MAP_DIMENSIONS = 10
 class PosColor(Enum):
     EMPTY = 0
     LIGHTWALL = 1
@@ -38,6 +37,14 @@ COLOR_MAP = {
     PosColor.DARKWALL: 'dimGray',
     PosColor.Portal: 'lime',
 }
+
+# RGB equivalents of COLOR_MAP for the framebuffer renderer
+RGB_MAP = {
+    PosColor.EMPTY: (178, 34, 34),
+    PosColor.LIGHTWALL: (128, 128, 128),
+    PosColor.DARKWALL: (105, 105, 105),
+    PosColor.Portal: (0, 255, 0),
+}
 MAP = [
     [PosColor.LIGHTWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.DARKWALL, PosColor.LIGHTWALL],
     [PosColor.LIGHTWALL, PosColor.EMPTY, PosColor.EMPTY, PosColor.EMPTY, PosColor.EMPTY, PosColor.EMPTY, PosColor.EMPTY, PosColor.EMPTY, PosColor.EMPTY, PosColor.LIGHTWALL],
@@ -4,30 +4,76 @@ PyDoom - A simple Doom-like game implementation using cmu_graphics. Why may you
 
 from typing import Tuple, Optional
 from dataclasses import dataclass
+import atexit
+import logging
 import math
+import sys
 import time
-from cmu_graphics import *
+import numpy as np
 import utils
 import constants
 from enemy import Imp, SpriteFrame
-import astar
+from profiler import Profiler
+import raycast
+import combat
+import pathfinding
+import sprites
+import camera
+import quality
+import gameloop
+import spatial
+import game_map
+import levels
+import framebuffer
+import assets
+import replay
+import preload
+
+logger = logging.getLogger(__name__)
 
 # General Game Config
 SCREEN_WIDTH = 400
 SCREEN_HEIGHT = 360
 RESOLUTION = 3 #Modify this if the game isn't running as fast as you hope, it c
+STEPS_PER_SECOND = 30 # Frames drawn per second
+ADAPTIVE_QUALITY = True # Adjust RESOLUTION and SPRITE_CAP from measured render times to hold STEPS_PER_SECOND, starting at RESOLUTION. Replays always play at a fixed quality
+SPRITE_CAP = None # Most enemies drawn per frame, nearest first, None draws all of them
 SPEED = 0.9
 INITIAL_HEALTH = 99
 WALL_HEIGHT_MOD = 2
 PLAYER_HEIGHT_MOD = 2
 ANIM_BUFFER = 0.1
 MAX_VIEW_DISTANCE = 20
+FOV = math.pi / 2 # Horizontal field of view in radians
+TICK_RATE = 30 # Simulation ticks per second, independent of how fast frames are drawn
+LEVEL = None # Path to a .txt, .npy or .pdl level file, None plays the built-in map in constants.MAP
+REPLAN_DISTANCE = 2 # Enemies keep their path until the player is more than this many cells from where it was planned to
+PATHFINDING = 'astar' # 'astar' searches once per enemy, 'flowfield' shares one search out from the player, 'hpa' searches between clusters for large maps
+HPA_CLUSTERS_PER_TICK = 2 # Clusters of the 'hpa' graph built each tick, nearest the player first, 'hpa' falls back to windowed A* until the map is covered
+PROFILE_OUTPUT = None # Path to write frame timings to as JSON on exit, e.g. 'profile.json'
+PROFILE_TRACE_OUTPUT = None # Path to write a Chrome trace (chrome://tracing, Perfetto) to on exit
+RENDERER = 'shapes' # 'shapes' builds cmu_graphics Polygons, 'framebuffer' draws into a single NumPy image
+RECORD_OUTPUT = None # Path to write the keys held on every step to on exit, replay it with --replay PATH
+WEAPON_DAMAGE = 34 # Health taken from an enemy per hit, Imps go down in three shots
+PRELOAD_WORKERS = 4 # Threads reading asset files in the background while the loading screen is shown
 
 # Add these variables to the top of the file with other game state
 shooting = False
 current_frame = 0
 frame_counter = 0
 enemies_current_frame = 0
+frame_image = None
+frame_source = None
+scene = None
+last_view = None
+current_level = None
+held_keys = set()
+recording = None
+muted = False
+drawn_enemies = []
+view_camera = None
+previous_pose = None
+render_time = 0.0 # Seconds the last frame spent drawing, what adaptive quality watches
 
 @dataclass
 class PlayerState:
@@ -38,46 +84,341 @@ class PlayerState:
 
 # Initialize game state
 player = PlayerState()
-current_screen = Group()
-app.stepsPerSecond = 30
-app.setMaxShapeCount(69000000)
-
-# Load game assets
-hud = Image('assets/DOOM_HUD.png', 0, 360, width=SCREEN_WIDTH, height=40)
-background = Image('assets/Loopedskies.png', 0, 0, width=1600, height=200, align='top')
-background.toBack()
-
-# Load sound effects
-sounds = {
-    'fire': Sound('assets/firing.mp3'),
-    'open': Sound('assets/opening.mp3'),
-    'reload': Sound('assets/reloading.mp3'),
-    'close': Sound('assets/closing.mp3')
+enemy_pathfinding = pathfinding.EnemyPathfinding()
+enemy_index = spatial.SpatialHash()
+profiler = Profiler()
+quality_controller = quality.QualityController(1 / STEPS_PER_SECOND, start_resolution=RESOLUTION)
+
+# Kinds of asset the game can't run without, sounds and weapon frames that fail to load are skipped
+FATAL_ASSET_KINDS = {'image', 'sprite'}
+
+# Images drawn around the world view
+IMAGE_FILES = {
+    'hud': 'assets/DOOM_HUD.png',
+    'sky': 'assets/Loopedskies.png'
 }
 
-# Test enemy
-constants.ENEMY_MAP.append(Imp(5.5, 3.5))
-# constants.ENEMY_MAP.append(Imp(1, 1))
-# constants.ENEMY_MAP.append(Imp(2, 2))
-# constants.ENEMY_MAP.append(Imp(1, 2))
-# constants.ENEMY_MAP.append(Imp(2, 1))
-
-# Weapon animation frames
-weapon_frames = {
-    'frame0': Image('assets/SS0.png', 200, 360, align='bottom', width=74, height=69, visible=True),
-    'frame1': Image('assets/SS1.png', 200, 360, align='bottom', width=102, height=100, visible=False),
-    'frame2': Image('assets/SS2.png', 200, 360, align='bottom', width=252, height=79, visible=False),
-    'frame3': Image('assets/SS3.png', 200, 360, align='bottom', width=110, height=64, visible=False),
-    'frame4': Image('assets/SS4.png', 200, 360, align='bottom', width=102, height=100, visible=False)
+# Sound effects
+SOUND_FILES = {
+    'fire': 'assets/firing.mp3',
+    'open': 'assets/opening.mp3',
+    'reload': 'assets/reloading.mp3',
+    'close': 'assets/closing.mp3'
 }
 
+# Weapon animation frames as (path, width, height), drawn at the bottom centre of the view
+WEAPON_FRAMES = {
+    'frame0': ('assets/SS0.png', 74, 69),
+    'frame1': ('assets/SS1.png', 102, 100),
+    'frame2': ('assets/SS2.png', 252, 79),
+    'frame3': ('assets/SS3.png', 110, 64),
+    'frame4': ('assets/SS4.png', 102, 100)
+}
+
+def graphics():
+    """Get the cmu_graphics module, importing it on first use so the engine can be imported without it."""
+    import cmu_graphics
+    return cmu_graphics
+
+class Game:
+    """The game window and everything drawn in it other than the world.
+    
+    Nothing is created until it is first needed, so importing doom for tools,
+    tests or the benchmarks never opens a window or loads an asset.
+    """
+    
+    def __init__(self):
+        self.started = False
+        self.ready = False
+        self.loader = None
+        self.load_error = None
+        self._loading_screen = None
+        self._loading_label = None
+        self._screen = None
+        self._hud = None
+        self._background = None
+        self.sounds = {}
+        self.weapon_frames = {}
+        self.missing = set()
+    
+    def start(self) -> None:
+        """Open the window on a loading screen, start reading every asset in the background and start the level.
+        
+        Gameplay begins in load_step once the assets the first frame needs
+        are ready, the sounds and other weapon frames keep streaming in after.
+        """
+        cmu = graphics()
+        cmu.app.stepsPerSecond = STEPS_PER_SECOND
+        cmu.app.setMaxShapeCount(69000000)
+        self.started = True
+        
+        # The world is drawn behind the sky, HUD and weapon, so its group is created before any of them
+        self.screen
+        self.loader = preload.AssetLoader(PRELOAD_WORKERS)
+        submit_assets(self.loader)
+        self.show_loading_screen()
+        self.update_loading_screen()
+        try:
+            start_default_level()
+        except Exception as error:
+            self.show_load_error('level', error)
+    
+    def load_step(self) -> bool:
+        """Create the shapes and sounds for assets that finished loading since the last step.
+        
+        If an image or sprite sheet fails to load, the game stops on the
+        loading screen with the error instead of crashing the step. Sounds and
+        weapon frames that fail are logged and left out.
+        
+        Returns:
+            True once the assets the first frame needs are ready and gameplay can run
+        """
+        if self.load_error is not None:
+            return False
+        for (kind, name), _, error in self.loader.finished():
+            if error is None:
+                try:
+                    if kind == 'sound':
+                        self.sound(name)
+                    elif kind == 'weapon':
+                        self.weapon_frame(name)
+                except Exception as create_error:
+                    error = create_error
+            if error is None:
+                continue
+            if kind in FATAL_ASSET_KINDS:
+                self.show_load_error(f'{kind} {name}', error)
+                return False
+            logger.error('Skipping %s %s, it failed to load', kind, name, exc_info=error)
+            self.missing.add((kind, name))
+        
+        if not self.ready:
+            if not self.loader.critical_ready():
+                self.update_loading_screen()
+                return False
+            graphics().app.group.remove(self._loading_screen)
+            self._loading_screen = self._loading_label = None
+            self.hud
+            self.background.toBack()
+            frame = self.weapon_frame('frame0')
+            if frame is not None:
+                frame.visible = True
+            self.ready = True
+        
+        if self.loader.done():
+            self.loader.shutdown()
+            self.loader = None
+        return True
+    
+    def show_loading_screen(self) -> None:
+        """Cover the window with the loading screen."""
+        cmu = graphics()
+        self._loading_label = cmu.Label('', SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, fill='white', size=20)
+        self._loading_screen = cmu.Group(cmu.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT + 40), self._loading_label)
+    
+    def update_loading_screen(self) -> None:
+        """Show how many assets have finished loading."""
+        self._loading_label.value = f'Loading {self.loader.loaded}/{self.loader.total}'
+    
+    def show_load_error(self, asset: str, error: Exception) -> None:
+        """Stop loading and show why an asset failed on the loading screen, bringing it back if gameplay had started.
+        
+        Args:
+            asset: What failed to load, e.g. 'image sky'
+            error: What loading it raised
+        """
+        self.load_error = error
+        self.loader.shutdown()
+        logger.error('Failed to load %s', asset, exc_info=error)
+        if self._loading_screen is None:
+            self.show_loading_screen()
+        self._loading_screen.toFront()
+        self._loading_label.size = 12
+        self._loading_label.value = f'Failed to load {asset}: {error}'
+    
+    @property
+    def screen(self):
+        """Group holding the 3D world view."""
+        if self._screen is None:
+            self._screen = graphics().Group()
+        return self._screen
+    
+    @property
+    def hud(self):
+        """Status bar image below the world view."""
+        if self._hud is None:
+            self._hud = graphics().Image(assets.get_display_image(IMAGE_FILES['hud']), 0, 360, width=SCREEN_WIDTH, height=40)
+        return self._hud
+    
+    @property
+    def background(self):
+        """Sky image behind the world view, scrolled as the player turns."""
+        if self._background is None:
+            self._background = graphics().Image(assets.get_display_image(IMAGE_FILES['sky']), 0, 0, width=1600, height=200, align='top')
+        return self._background
+    
+    def sound(self, name: str):
+        """Get a sound effect from SOUND_FILES, loading it on first use, or None if it failed to load."""
+        if ('sound', name) in self.missing:
+            return None
+        sound = self.sounds.get(name)
+        if sound is None:
+            sound = graphics().Sound(SOUND_FILES[name])
+            self.sounds[name] = sound
+        return sound
+    
+    def weapon_frame(self, name: str):
+        """Get a weapon animation frame from WEAPON_FRAMES, hidden until shown, loading it on first use, or None if it failed to load."""
+        if ('weapon', name) in self.missing:
+            return None
+        frame = self.weapon_frames.get(name)
+        if frame is None:
+            filepath, width, height = WEAPON_FRAMES[name]
+            frame = graphics().Image(assets.get_display_image(filepath), 200, 360, align='bottom', width=width, height=height, visible=False)
+            self.weapon_frames[name] = frame
+        return frame
+
+game = Game()
+
+def submit_assets(loader: preload.AssetLoader) -> None:
+    """Queue every asset file on a background loader, the ones the first frame needs first.
+    
+    Workers decode images into the shared asset caches and read sound files
+    so they are served from the OS cache. The cmu_graphics shapes and sounds
+    are created from them on the main thread by Game.load_step.
+    
+    Args:
+        loader: Loader to queue the assets on
+    """
+    # The framebuffer renderer draws the sky and sprites from decoded pixels instead of cmu_graphics images
+    decode = RENDERER == 'framebuffer'
+    
+    def load_image(filepath: str) -> None:
+        assets.get_display_image(filepath)
+        if decode:
+            assets.get_texture(filepath)
+    
+    def load_sprite_sheet(name: str, frame_count: int) -> None:
+        for frame in assets.get_sprite_sheet(name, frame_count):
+            load_image(frame.path)
+    
+    loader.submit(('image', 'hud'), lambda: assets.get_display_image(IMAGE_FILES['hud']), critical=True)
+    loader.submit(('image', 'sky'), lambda: load_image(IMAGE_FILES['sky']), critical=True)
+    loader.submit(('weapon', 'frame0'), lambda: assets.get_display_image(WEAPON_FRAMES['frame0'][0]), critical=True)
+    loader.submit(('sprite', 'Imp'), lambda: load_sprite_sheet('Imp', 4), critical=True)
+    for name, (filepath, _, _) in WEAPON_FRAMES.items():
+        if name != 'frame0':
+            loader.submit(('weapon', name), lambda filepath=filepath: assets.get_display_image(filepath))
+    for name, filepath in SOUND_FILES.items():
+        loader.submit(('sound', name), lambda filepath=filepath: preload.read_file(filepath))
+
+def play_sound(name: str) -> None:
+    """Play a sound effect unless sound is muted or the game window isn't open.
+    
+    Args:
+        name: Key of the sound in SOUND_FILES
+    """
+    if not muted and game.started:
+        sound = game.sound(name)
+        if sound is not None:
+            sound.play()
+
+def spawn_enemy(enemy) -> None:
+    """Add an enemy to the game and to the spatial index.
+    
+    Args:
+        enemy: The enemy to add
+    """
+    constants.ENEMY_MAP.append(enemy)
+    enemy_index.insert(enemy)
+
+def load_level(filepath: str) -> None:
+    """Switch to a level file, replacing the map, enemies and player position.
+    
+    Args:
+        filepath: Path to a .txt, .npy or .pdl level
+    """
+    global current_level
+    start_level(levels.load_level(filepath))
+    current_level = filepath
+
+def start_level(world: game_map.GameMap) -> None:
+    """Switch to a map, spawning its enemies and moving the player to its start.
+    
+    Args:
+        world: Map to play on
+    """
+    game_map.set_current_map(world)
+    
+    constants.ENEMY_MAP.clear()
+    enemy_index.clear()
+    for x, y, kind in world.spawns:
+        if kind == 'imp':
+            spawn_enemy(Imp(x, y))
+    
+    if world.player_start is not None:
+        player.x, player.y = world.player_start
+
+def default_level() -> game_map.GameMap:
+    """Get the built-in map from constants.MAP with its test enemy."""
+    world = game_map.GameMap.from_rows(constants.MAP)
+    world.player_start = (1.5, 1.5)
+    
+    # Test enemy
+    world.spawns = [(5.5, 3.5, 'imp')]
+    # world.spawns.append((1, 1, 'imp'))
+    # world.spawns.append((2, 2, 'imp'))
+    return world
+
+def start_default_level() -> None:
+    """Start LEVEL if one is configured, otherwise the built-in map."""
+    global current_level
+    if LEVEL:
+        load_level(LEVEL)
+    else:
+        start_level(default_level())
+        current_level = None
+
 def shoot() -> None:
-    """Handle weapon shooting animation and sound effects."""
+    """Handle weapon shooting animation and sound effects, and damage the enemy in the line of fire."""
     global shooting, current_frame
     if not shooting:
         shooting = True
         current_frame = 0
-        sounds['fire'].play()
+        play_sound('fire')
+        
+        target = hitscan(player.angle)
+        if target is not None and target.take_damage(WEAPON_DAMAGE):
+            kill_enemy(target)
+
+def hitscan(angle: float) -> Optional[Imp]:
+    """Find the nearest enemy a shot from the player hits, see combat.find_target.
+    
+    Args:
+        angle: Angle to fire at
+        
+    Returns:
+        The enemy that gets hit, or None if the shot hits a wall or nothing
+    """
+    max_radius = max((enemy_radius(enemy) for enemy in enemy_index), default=0)
+    return combat.find_target(game_map.current_map(), enemy_index, player.x, player.y, angle, MAX_VIEW_DISTANCE,
+                              enemy_radius, max_radius)
+
+def enemy_radius(enemy) -> float:
+    """Get the radius of the circle an enemy can be shot in, as wide as its current frame is drawn."""
+    return combat.billboard_radius(enemy.sprite.width, enemy.sprite.height, SCREEN_WIDTH, SCREEN_HEIGHT, FOV)
+
+def kill_enemy(enemy) -> None:
+    """Take an enemy out of the game.
+    
+    Args:
+        enemy: The enemy to remove
+    """
+    constants.ENEMY_MAP.remove(enemy)
+    enemy_index.remove(enemy)
+    enemy.visible = False
+    for image in enemy.images.values():
+        image.visible = False
 
 def update_weapon_animation() -> None:
     """Update weapon animation state."""
@@ -97,30 +438,42 @@ def update_weapon_animation() -> None:
         
         # Play appropriate sound for current frame
         if current_frame == 1:
-            sounds['open'].play()
+            play_sound('open')
         elif current_frame == 2:
-            sounds['reload'].play()
+            play_sound('reload')
         elif current_frame == 4:
-            sounds['close'].play()
-    
-    # Hide all frames
-    for frame in weapon_frames.values():
-        frame.visible = False
+            play_sound('close')
     
     # Show current frame
     if current_frame == 0:
-        weapon_frames['frame0'].visible = True
+        show_weapon_frame('frame0')
     elif current_frame == 1:
-        weapon_frames['frame1'].visible = True
+        show_weapon_frame('frame1')
     elif current_frame == 2:
-        weapon_frames['frame2'].visible = True
+        show_weapon_frame('frame2')
     elif current_frame == 3:
-        weapon_frames['frame2'].visible = True  # Keep frame2 visible during reload
+        show_weapon_frame('frame2')  # Keep frame2 visible during reload
     else:
         # Aaaaaaaand we're done!
-        weapon_frames['frame0'].visible = True
+        show_weapon_frame('frame0')
         shooting = False
 
+def show_weapon_frame(name: str) -> None:
+    """Show one weapon frame and hide the others, if the game window is open.
+    
+    Args:
+        name: Key of the frame in WEAPON_FRAMES
+    """
+    if not game.started:
+        return
+    
+    # Hide all frames
+    for frame in game.weapon_frames.values():
+        frame.visible = False
+    frame = game.weapon_frame(name)
+    if frame is not None:
+        frame.visible = True
+
 def render_shape(vertices: list[Tuple[float, float]], color: str, shape_type: str = 'quad') -> None:
     """Render a shape (triangle or quad) to the current screen.
     
@@ -130,13 +483,13 @@ def render_shape(vertices: list[Tuple[float, float]], color: str, shape_type: st
         shape_type: Either 'quad' or 'tri'
     """
     if shape_type == 'quad' and len(vertices) == 4:
-        shape = Polygon(*[coord for vertex in vertices for coord in vertex], fill=color)
+        shape = graphics().Polygon(*[coord for vertex in vertices for coord in vertex], fill=color)
     elif shape_type == 'tri' and len(vertices) == 3:
-        shape = Polygon(*[coord for vertex in vertices for coord in vertex], fill=color)
+        shape = graphics().Polygon(*[coord for vertex in vertices for coord in vertex], fill=color)
     else:
         raise ValueError(f"Invalid shape type or number of vertices: {shape_type}, {len(vertices)}")
     
-    current_screen.add(shape)
+    game.screen.add(shape)
 
 def calculate_wall_dimensions(distance: float, column_angle: float) -> Tuple[int, int]:
     """Calculate wall dimensions based on distance and angle.
@@ -156,6 +509,13 @@ def calculate_wall_dimensions(distance: float, column_angle: float) -> Tuple[int
     
     return wall_top, wall_bottom
 
+def get_camera() -> camera.Camera:
+    """Get the projection tables for the current screen, RESOLUTION and FOV, rebuilding them only when those change."""
+    global view_camera
+    if view_camera is None or not view_camera.matches(SCREEN_WIDTH, SCREEN_HEIGHT, RESOLUTION, FOV):
+        view_camera = camera.Camera(SCREEN_WIDTH, SCREEN_HEIGHT, RESOLUTION, FOV, WALL_HEIGHT_MOD, PLAYER_HEIGHT_MOD)
+    return view_camera
+
 def calculate_sprite_dimensions(distance: float, sprite_frame: SpriteFrame) -> Tuple[float, float]:
     """Calculate sprite dimensions based on distance and actual sprite dimensions.
     
@@ -230,11 +590,6 @@ def render_sprite(sprite: Imp) -> Optional[dict]:
         (screen_x - half_width, screen_y + half_height)
     ]
     
-    # Hide all sprite frames except current one
-    for s in sprite.sprites:
-        s.image.visible = False
-    sprite.sprite.image.visible = True
-    
     return {
         'type': 'sprite',
         'distance': corrected_distance,
@@ -242,106 +597,198 @@ def render_sprite(sprite: Imp) -> Optional[dict]:
         'sprite': sprite
     }
 
-def run_world() -> None:
-    """Render the 3D world view with proper depth sorting."""
-    render_elements = []
+def project_enemies(depths: Optional[np.ndarray] = None) -> list:
+    """Project every visible enemy onto the screen in one batch.
     
-    for column in range(0, SCREEN_WIDTH, RESOLUTION):
-        column_angle = player.angle - (math.atan(0.5 - (column + 0.5) / (SCREEN_WIDTH / 2)))
-        distance, wall_type = ray_cast(column_angle)
-        
-        wall_top, wall_bottom = calculate_wall_dimensions(distance, column_angle)
-        
-        render_elements.append({
-            'type': 'floor',
-            'distance': MAX_VIEW_DISTANCE,  
-            'vertices': [
-                (column, wall_bottom),
-                (column + RESOLUTION, wall_bottom),
-                (column + RESOLUTION, SCREEN_HEIGHT),
-                (column, SCREEN_HEIGHT)
-            ],
-            'color': constants.PosColor.EMPTY.color()
-        })
+    Args:
+        depths: Fisheye corrected wall distance per column, used to cull enemies hidden behind walls
         
-        render_elements.append({
-            'type': 'wall',
-            'distance': distance,
-            'vertices': [
-                (column, wall_top),
-                (column + RESOLUTION, wall_top),
-                (column + RESOLUTION, wall_bottom),
-                (column, wall_bottom)
-            ],
-            'color': wall_type.color() if wall_type else constants.PosColor.LIGHTWALL.color()
-        })
+    Returns:
+        List of (enemy, left, top, width, height, distance) sorted far to near, keeping only the nearest SPRITE_CAP
+    """
+    # Sprites stand in the middle of their cell, so look around the player's position shifted back by half a cell
+    nearby = enemy_index.within_radius(player.x - 0.5, player.y - 0.5, MAX_VIEW_DISTANCE)
+    enemies = [enemy for enemy in nearby if enemy.visible]
+    if not enemies:
+        return []
     
-    # Update and render sprites
+    indices, lefts, tops, widths, heights, distances = sprites.project_sprites(
+        [enemy.x for enemy in enemies], [enemy.y for enemy in enemies],
+        [enemy.sprite.width / enemy.sprite.height for enemy in enemies],
+        player.x, player.y, player.angle, SCREEN_WIDTH, SCREEN_HEIGHT, MAX_VIEW_DISTANCE, depths, RESOLUTION, FOV)
+    if SPRITE_CAP is not None:
+        indices, lefts, tops, widths, heights, distances = (values[-SPRITE_CAP:] if SPRITE_CAP else values[:0]
+                                                            for values in (indices, lefts, tops, widths, heights, distances))
+    return [(enemies[i], left, top, width, height, distance) for i, left, top, width, height, distance
+            in zip(indices.tolist(), lefts.tolist(), tops.tolist(), widths.tolist(), heights.tolist(), distances.tolist())]
+
+def render_framebuffer() -> framebuffer.FrameBuffer:
+    """Render the 3D world view into a framebuffer.
     
-    for enemy in constants.ENEMY_MAP:    
-        enemy.update_animation()
-        sprite_element = render_sprite(enemy)
-        if sprite_element:
-            render_elements.append(sprite_element)
-        
-        render_elements.sort(key=lambda x: -x['distance'])
-        
-        current_screen.clear()
+    Returns:
+        Framebuffer holding the sky, floor, walls and sprites
+    """
+    frame = framebuffer.FrameBuffer(SCREEN_WIDTH, SCREEN_HEIGHT)
+    
+    with profiler.phase('raycast'):
+        projection = get_camera()
+        ray_dir_x, ray_dir_y = projection.ray_directions(player.angle)
+        grid, left, top = game_map.current_map().window(player.x, player.y, MAX_VIEW_DISTANCE + 1)
+        distances, wall_types, _ = raycast.cast_ray_directions(player.x - left, player.y - top, ray_dir_x, ray_dir_y,
+                                                               grid, MAX_VIEW_DISTANCE)
+    
+    with profiler.phase('shapes'):
+        depths, wall_tops, wall_bottoms = projection.project_walls(distances)
         
-        background_group = Group()  
-        sprite_group = Group()      
-        wall_group = Group()        
+        # Sky scrolls with the player's angle the same way the background image does
+        frame.draw_image(assets.get_texture(IMAGE_FILES['sky']), player.angle * -63.661 + 200 - 800, 0, 1600, 200)
+        frame.fill(game_map.RGB[constants.PosColor.EMPTY.value], SCREEN_HEIGHT // 2)
+        frame.draw_columns(RESOLUTION, wall_tops, wall_bottoms, game_map.RGB[wall_types])
+    
+    with profiler.phase('sprites'):
+        depth_buffer = np.repeat(depths, RESOLUTION)[:SCREEN_WIDTH]
+        visible_sprites = project_enemies(depths)
+    
+    with profiler.phase('shapes'):
+        for enemy, left, top, width, height, distance in visible_sprites:
+            frame.draw_image(assets.get_texture(enemy.sprite.path), left, top, width, height, distance, depth_buffer)
+    
+    return frame
+
+def present_frame(frame: framebuffer.FrameBuffer) -> None:
+    """Show a rendered framebuffer in the game window as a single image.
+    
+    The same Image shape and CMUImage are kept for every frame, only the
+    pixels behind them are replaced.
     
-        current_screen.add(background_group)
-        current_screen.add(sprite_group)
-        current_screen.add(wall_group)
+    Args:
+        frame: Framebuffer to show
+    """
+    global frame_image, frame_source
+    cmu = graphics()
+    from PIL import Image as PILImage
+    height, width = frame.pixels.shape[:2]
+    
+    if frame_image is None or (frame_image.width, frame_image.height) != (width, height):
+        if frame_image is not None:
+            cmu.app.group.remove(frame_image)
+        frame_source = cmu.CMUImage(PILImage.new('RGBA', (width, height)))
+        frame_image = cmu.Image(frame_source, 0, 0)
+        frame_image.toBack()
+        game.background.visible = False
+    
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[:, :, :3] = frame.pixels
+    rgba[:, :, 3] = 255
+    
+    # An Image's url can't be changed once it is made, but it draws whatever cmu_graphics has loaded for the
+    # CMUImage's uuid, so swapping that for this frame's pixels redraws the same shape with them. The frame is drawn
+    # at its own size, so cmu_graphics never keeps a scaled copy of older pixels. This relies on the internals of
+    # the cmu_graphics version pinned in requirements.txt
+    try:
+        from cmu_graphics import shape_logic
+        from cmu_graphics.deps import wyvern
+        shape_logic.activeDrawing.images[frame_source.uuid] = wyvern.WyvernImage(bytearray(rgba), width, height, width * 4)
+    except (ImportError, AttributeError, TypeError):
+        # Other versions get a new Image from the public API every frame. That works anywhere, but cmu_graphics
+        # converts and caches every frame's pixels under a new uuid
+        cmu.app.group.remove(frame_image)
+        frame_source = cmu.CMUImage(PILImage.fromarray(rgba))
+        frame_image = cmu.Image(frame_source, 0, 0)
+        frame_image.toBack()
+
+def save_frame(filepath: str) -> None:
+    """Render the current view and write it to a PNG file without touching the display.
+    
+    Args:
+        filepath: Path to write to
+    """
+    render_framebuffer().save(filepath)
+
+def run_world() -> None:
+    """Render the 3D world view with proper depth sorting."""
+    if RENDERER == 'framebuffer':
+        present_frame(render_framebuffer())
+        return
+    
+    global scene, last_view, drawn_enemies
+    
+    if scene is None or scene.column_width != RESOLUTION:
+        from scene import Scene
+        if scene is not None:
+            scene.remove()
+        scene = Scene(game.screen, SCREEN_WIDTH, SCREEN_HEIGHT, RESOLUTION, game_map.COLORS[constants.PosColor.EMPTY.value])
+        last_view = None
+    
+    # Walls only change when the player moves or turns, or the map changes
+    game.background.centerX = player.angle * -63.661 + 200
+    
+    world = game_map.current_map()
+    view = (player.x, player.y, player.angle, world, world.version)
+    if view != last_view:
+        with profiler.phase('raycast'):
+            projection = get_camera()
+            ray_dir_x, ray_dir_y = projection.ray_directions(player.angle)
+            # Chunked maps only hand out the chunks the view distance can reach
+            grid, left, top = world.window(player.x, player.y, MAX_VIEW_DISTANCE + 1)
+            distances, wall_types, _ = raycast.cast_ray_directions(player.x - left, player.y - top, ray_dir_x, ray_dir_y,
+                                                                   grid, MAX_VIEW_DISTANCE)
         
-        if sprite_element:
-            sprite = sprite_element['sprite']
-            current_frame = sprite.sprite.image
-            current_frame.centerX = int((sprite_element['vertices'][0][0] + sprite_element['vertices'][1][0]) / 2)
-            current_frame.centerY = int((sprite_element['vertices'][0][1] + sprite_element['vertices'][2][1]) / 2)
-            current_frame.width = sprite_element['vertices'][1][0] - sprite_element['vertices'][0][0] + 0.1
-            current_frame.height = sprite_element['vertices'][2][1] - sprite_element['vertices'][0][1] + 0.1
-            sprite_group.add(current_frame)
-    
-    for element in render_elements:
-        if element['type'] == 'sprite':
-            continue  
+        with profiler.phase('shapes'):
+            depths, wall_tops, wall_bottoms = projection.project_walls(distances)
+            scene.update_walls(wall_tops.tolist(), wall_bottoms.tolist(),
+                               [game_map.COLORS[wall_type] for wall_type in wall_types.tolist()], depths.tolist())
+        last_view = view
+    
+    # Update and render sprites
+    with profiler.phase('sprites'):
+        visible_sprites = project_enemies(np.array(scene.depths))
+    
+    with profiler.phase('shapes'):
+        # Only enemies drawn last frame can have a visible image to hide
+        visible_enemies = {id(enemy) for enemy, *_ in visible_sprites}
+        for enemy in drawn_enemies:
+            if id(enemy) not in visible_enemies:
+                for image in enemy.images.values():
+                    image.visible = False
+        drawn_enemies = [enemy for enemy, *_ in visible_sprites]
         
-        shape = Polygon(*[coord for vertex in element['vertices'] for coord in vertex], 
-                      fill=element['color'])
+        layers = []
+        for enemy, left, top, width, height, distance in visible_sprites:
+            # Hide all sprite frames except current one
+            current_frame = enemy.show_current_frame()
+            current_frame.centerX = int(left + width / 2)
+            current_frame.centerY = int(top + height / 2)
+            current_frame.width = width + 0.1
+            current_frame.height = height + 0.1
+            layers.append((current_frame, distance, left, left + width))
         
-        if element['type'] == 'floor':
-            background_group.add(shape)
-        else:  
-            if sprite_element and element['distance'] > sprite_element['distance']:
-                background_group.add(shape)
-            else:
-                wall_group.add(shape)
-    
-    background_group.toBack()
-    sprite_group.toFront()
-    wall_group.toFront()
+        # Each sprite is clipped per column against the wall depth buffer
+        scene.update_sprites(layers)
     
 def move_enemies():
     """Movies all enemies that can move towards the player every 60 frames (roughly once per second)."""
     global enemies_current_frame
     
+    player_cell = (int(player.x), int(player.y))
+    enemy_pathfinding.tick(PATHFINDING, HPA_CLUSTERS_PER_TICK, player_cell)
+    
     enemies_current_frame += 1
     if enemies_current_frame % 10 != 0:
         return
-    print(f"player at {player.x} {player.y}")
+    enemy_pathfinding.plan(PATHFINDING, player_cell)
+    
     for enemy in constants.ENEMY_MAP:
-        path = astar.find_path((enemy.x, enemy.y), (player.x, player.y))
-        if not path or len(path) < 2:
-            print("no path")
-            print(f"for pos {enemy.x} {enemy.y}")
+        next_pos = enemy_pathfinding.next_step(enemy, PATHFINDING, player_cell, REPLAN_DISTANCE)
+        if next_pos is None:
             continue
-        enemy.move_to(path[1])
+        enemy.move_to(next_pos)
 
 def ray_cast(angle: float) -> Optional[Tuple[float, constants.PosColor]]:
-    """Cast a ray and return the distance to the nearest wall.
+    """Cast a single ray from the player and return the distance to the nearest wall.
+    
+    Frames cast every column at once with raycast.cast_ray_directions, this
+    casts one ray with the same stepping.
     
     Args:
         angle: Angle to cast ray at
@@ -349,64 +796,9 @@ def ray_cast(angle: float) -> Optional[Tuple[float, constants.PosColor]]:
     Returns:
         Tuple of (distance to nearest wall, wall type) or (MAX_VIEW_DISTANCE, default wall) if no wall found
     """
-    # Calculate ray direction vector
-    ray_dir_x = math.cos(angle)
-    ray_dir_y = math.sin(angle)
-    
-    # Get player's current map position
-    map_x = int(player.x)
-    map_y = int(player.y)
-    
-    # Calculate ray step and initial side distance
-    delta_dist_x = abs(1 / (ray_dir_x + 0.0001))
-    delta_dist_y = abs(1 / (ray_dir_y + 0.0001))
-    
-    if ray_dir_x < 0:
-        step_x = -1
-        side_dist_x = (player.x - map_x) * delta_dist_x
-    else:
-        step_x = 1
-        side_dist_x = (map_x + 1.0 - player.x) * delta_dist_x
-        
-    if ray_dir_y < 0:
-        step_y = -1
-        side_dist_y = (player.y - map_y) * delta_dist_y
-    else:
-        step_y = 1
-        side_dist_y = (map_y + 1.0 - player.y) * delta_dist_y
-    
-    # Perform DDA
-    hit = False
-    side = 0  # 0 for NS wall, 1 for EW wall
-    wall_type = None
-    
-    while not hit and map_x >= 0 and map_x < constants.MAP_DIMENSIONS and map_y >= 0 and map_y < constants.MAP_DIMENSIONS:
-        # Jump to next map square
-        if side_dist_x < side_dist_y:
-            side_dist_x += delta_dist_x
-            map_x += step_x
-            side = 0
-        else:
-            side_dist_y += delta_dist_y
-            map_y += step_y
-            side = 1
-            
-        # Check if ray has hit a wall
-        if map_x >= 0 and map_x < constants.MAP_DIMENSIONS and map_y >= 0 and map_y < constants.MAP_DIMENSIONS:
-            wall_type = constants.MAP[map_y][map_x]
-            if wall_type != constants.PosColor.EMPTY:
-                hit = True
-    
-    if not hit:
-        return MAX_VIEW_DISTANCE, constants.PosColor.LIGHTWALL  # Default to light wall if no hit
-        
-    # Calculate distance projected on camera direction
-    if side == 0:
-        perp_wall_dist = (map_x - player.x + (1 - step_x) / 2) / ray_dir_x
-    else:
-        perp_wall_dist = (map_y - player.y + (1 - step_y) / 2) / ray_dir_y
-        
-    return perp_wall_dist, wall_type
+    grid, left, top = game_map.current_map().window(player.x, player.y, MAX_VIEW_DISTANCE + 1)
+    distance, wall_value = raycast.cast_ray(player.x - left, player.y - top, angle, grid, MAX_VIEW_DISTANCE)
+    return distance, game_map.TILE_TYPES[wall_value]
 
 def handle_movement(keys: set) -> None:
     """Handle player movement based on keyboard input.
@@ -440,19 +832,142 @@ def handle_rotation(keys: set) -> None:
     """
     if 'left' in keys:
         player.angle = (player.angle - math.pi/16) % (math.pi * 2)
-        background.centerX = player.angle * -63.661 + 200
     if 'right' in keys:
         player.angle = (player.angle + math.pi/16) % (math.pi * 2)
-        background.centerX = player.angle * -63.661 + 200
 
-def onStep() -> None:
-    """Game update function called every frame."""
+def update_enemy_animations() -> None:
+    """Advance every enemy's animation by one frame."""
+    for enemy in constants.ENEMY_MAP:
+        enemy.update_animation()
+
+def simulate_tick() -> None:
+    """Advance the simulation by one fixed tick, applying the held keys."""
+    global previous_pose
+    if recording is not None:
+        recording.record(held_keys)
+    previous_pose = (player.x, player.y, player.angle)
+    
+    apply_input(held_keys)
+    with profiler.phase('animation'):
+        update_weapon_animation()
+        update_enemy_animations()
+    with profiler.phase('pathfinding'):
+        move_enemies()
+
+def interpolate_pose(start: Tuple[float, float, float], end: Tuple[float, float, float], alpha: float) -> Tuple[float, float, float]:
+    """Blend two player poses, turning the short way round.
+    
+    Args:
+        start: (x, y, angle) at the previous tick
+        end: (x, y, angle) at the latest tick
+        alpha: How far to blend towards end, from 0 to 1
+        
+    Returns:
+        The blended (x, y, angle)
+    """
+    turn = (end[2] - start[2] + math.pi) % (math.pi * 2) - math.pi
+    return (start[0] + (end[0] - start[0]) * alpha,
+            start[1] + (end[1] - start[1]) * alpha,
+            (start[2] + turn * alpha) % (math.pi * 2))
+
+def render_frame(alpha: float) -> None:
+    """Draw the world with the player's view interpolated between the last two ticks.
+    
+    Args:
+        alpha: How far the frame is past the previous tick, from 0 to 1
+    """
+    if previous_pose is None:
+        draw_world()
+        return
+    
+    pose = (player.x, player.y, player.angle)
+    player.x, player.y, player.angle = interpolate_pose(previous_pose, pose, alpha)
+    try:
+        draw_world()
+    finally:
+        player.x, player.y, player.angle = pose
+
+def draw_world() -> None:
+    """Draw the world, keeping how long it took in render_time for adaptive quality."""
+    global render_time
+    start = time.perf_counter()
     run_world()
-    update_weapon_animation()
-    move_enemies()
+    render_time = time.perf_counter() - start
+
+def step_game(render: bool = True) -> None:
+    """Advance the game by exactly one tick and draw it, as playback does for every recorded tick.
+    
+    Args:
+        render: Whether to draw the world this step
+    """
+    profiler.begin_frame()
+    simulate_tick()
+    if render:
+        draw_world()
+    profiler.end_frame()
+    
+    if render and ADAPTIVE_QUALITY:
+        adapt_quality(render_time)
+
+def simulate(ticks: int, keys=()) -> None:
+    """Run the simulation alone as fast as possible, holding the same keys for every tick, with sound muted.
+    
+    Args:
+        ticks: Number of ticks to run
+        keys: Keys held during every tick
+    """
+    global held_keys, muted
+    held_keys = set(keys)
+    was_muted, muted = muted, True
+    try:
+        game_loop.run(ticks)
+    finally:
+        muted = was_muted
+
+def adapt_quality(render_time: float) -> None:
+    """Feed a render time to the quality controller and apply the level it picks.
+    
+    Only drawing is measured, since simulation ticks and pathfinding don't
+    get any cheaper at a lower quality.
+    
+    Args:
+        render_time: Time drawing the last frame took in seconds
+    """
+    global RESOLUTION, SPRITE_CAP
+    quality_controller.target_frame_time = 1 / STEPS_PER_SECOND
+    quality_controller.record(render_time)
+    RESOLUTION = quality_controller.resolution
+    SPRITE_CAP = quality_controller.sprite_cap
+
+def quality_stats() -> dict:
+    """Get the adaptive quality level and the frame times behind it, see QualityController.stats."""
+    return quality_controller.stats()
+
+def onStep() -> None:
+    """Game update function called every frame. Runs however many simulation ticks are due, then renders once."""
+    global held_keys
+    if game.loader is not None and not game.load_step():
+        return
+    
+    profiler.begin_frame()
+    if game_loop.frame():
+        held_keys = set()
+    profiler.end_frame()
+    
+    if ADAPTIVE_QUALITY:
+        adapt_quality(render_time)
 
 def onKeyHold(keys: set) -> None:
-    """Handle keyboard input.
+    """Handle keyboard input by holding the keys for the simulation ticks of this frame.
+    
+    Args:
+        keys: Set of currently held keys
+    """
+    global held_keys
+    held_keys = set(keys)
+
+def apply_input(keys: set) -> None:
+    """Move, turn and shoot according to the held keys.
     
     Args:
         keys: Set of currently held keys
@@ -477,7 +992,82 @@ def is_collision(x: float, y: float) -> bool:
     
     if not utils.is_inside_map((grid_x, grid_y)):
         return True
-    return constants.MAP[grid_y][grid_x].is_impassible()
+    return not game_map.current_map().is_passable(grid_x, grid_y)
+
+def export_profile() -> None:
+    """Write the recorded frame timings to the configured profile outputs."""
+    if PROFILE_OUTPUT:
+        profiler.export_json(PROFILE_OUTPUT)
+    if PROFILE_TRACE_OUTPUT:
+        profiler.export_chrome_trace(PROFILE_TRACE_OUTPUT)
+
+def start_recording() -> None:
+    """Start recording the keys held on every step from the current level and player position."""
+    global recording
+    recording = replay.Recording(current_level, (player.x, player.y, player.angle))
+
+def save_recording() -> None:
+    """Write the session's recording to RECORD_OUTPUT."""
+    if recording is not None and RECORD_OUTPUT:
+        recording.save(RECORD_OUTPUT)
+
+def play_recording(session: replay.Recording, render: bool = True) -> float:
+    """Replay a recorded session as fast as possible, without waiting for the window.
+    
+    Quality is pinned at RESOLUTION and SPRITE_CAP for the whole replay, so
+    every run of a recording draws the same frames and its timings compare.
+    
+    Args:
+        session: Recording to play back
+        render: Whether to draw the world on every step
+        
+    Returns:
+        Seconds taken to play the whole recording
+    """
+    global enemies_current_frame, muted, held_keys, ADAPTIVE_QUALITY
+    if session.level:
+        load_level(session.level)
+    else:
+        start_level(default_level())
+    player.x, player.y, player.angle = session.start
+    enemies_current_frame = 0
+    
+    was_muted, muted = muted, True
+    was_adaptive, ADAPTIVE_QUALITY = ADAPTIVE_QUALITY, False
+    try:
+        start = time.perf_counter()
+        for keys in session:
+            held_keys = keys
+            step_game(render)
+        return time.perf_counter() - start
+    finally:
+        muted = was_muted
+        ADAPTIVE_QUALITY = was_adaptive
+
+game_loop = gameloop.GameLoop(simulate_tick, render_frame, TICK_RATE)
+
+atexit.register(export_profile)
+atexit.register(save_recording)
 
 if __name__ == '__main__':
-    cmu_graphics.run()
\ No newline at end of file
+    if '--level' in sys.argv:
+        LEVEL = sys.argv[sys.argv.index('--level') + 1]
+    if '--record' in sys.argv:
+        RECORD_OUTPUT = sys.argv[sys.argv.index('--record') + 1]
+    if '--replay' in sys.argv:
+        session = replay.load_recording(sys.argv[sys.argv.index('--replay') + 1])
+        elapsed = play_recording(session, render='--no-render' not in sys.argv)
+        print(f"Replayed {len(session)} steps in {elapsed:.2f}s ({len(session) / elapsed:.1f} steps/s)")
+        for name, stats in profiler.stats().items():
+            print(f"{name:>12}: mean {stats['mean']:.2f} ms, p95 {stats['p95']:.2f} ms")
+        print(f"     quality: RESOLUTION={RESOLUTION}, SPRITE_CAP={SPRITE_CAP}")
+        if PATHFINDING in enemy_pathfinding.path_caches:
+            print(f"       paths: {enemy_pathfinding.path_caches[PATHFINDING].stats()}")
+    elif '--headless' in sys.argv:
+        start_default_level()
+        save_frame(sys.argv[-1])
+    else:
+        game.start()
+        if RECORD_OUTPUT:
+            start_recording()
+        graphics().cmu_graphics.run()
\ No newline at end of file
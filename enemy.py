@@ -2,17 +2,13 @@
 Enemy classes for PyDoom game
 """
 
-from cmu_graphics import Image
-from dataclasses import dataclass
 import math
-from image_utils import get_png_dimensions
+from typing import TYPE_CHECKING
+import assets
+from assets import SpriteFrame
 
-@dataclass
-class SpriteFrame:
-    """Class to hold sprite frame data."""
-    image: Image
-    width: int
-    height: int
+if TYPE_CHECKING:
+    from cmu_graphics import Image
 
 class Enemy:
     """Base enemy class."""
@@ -24,6 +20,8 @@ class Enemy:
         self.speed = 0.1
         self.angle = 0
         self.visible = False
+        self.index = None  # Spatial index this enemy is in, kept up to date as it moves
+        self.route = None  # Path this enemy is following towards the player, see pathcache.Route
 
     def move(self) -> None:
         """Update enemy position."""
@@ -33,6 +31,18 @@ class Enemy:
         """Update enemy visibility."""
         pass
 
+    def take_damage(self, amount: int) -> bool:
+        """Reduce the enemy's health.
+        
+        Args:
+            amount: Health to take away
+            
+        Returns:
+            True if the enemy has no health left
+        """
+        self.health -= amount
+        return self.health <= 0
+
 class Imp(Enemy):
     """Imp enemy class."""
     
@@ -43,19 +53,33 @@ class Imp(Enemy):
         self.frame_counter = 0
         self.current_frame = 0
         self.frames_per_state = 8
-        self.sprites = []
         
-        # Load all animation frames with actual dimensions
-        for i in range(4):  # frame0 to frame3
-            filepath = f'assets/Imp/frame{i}.png'
-            width, height = get_png_dimensions(filepath)
-            sprite = Image(filepath, self.x, self.y,
-                         align='bottom', width=width, height=height, visible=False)
-            self.sprites.append(SpriteFrame(sprite, width, height))
+        # Animation frames are shared by every Imp, display images are only made for frames that get drawn
+        self.sprites = assets.get_sprite_sheet('Imp', 4)
+        self.images = {}
         
         self.sprite = self.sprites[0]  # Current visible sprite
         self.visible = True
     
+    def image(self) -> 'Image':
+        """Get this imp's display image for the current frame, creating it on first use."""
+        image = self.images.get(self.current_frame)
+        if image is None:
+            # Imported here so the game logic can run without cmu_graphics
+            from cmu_graphics import Image
+            image = Image(assets.get_display_image(self.sprite.path), self.x, self.y,
+                          align='bottom', width=self.sprite.width, height=self.sprite.height, visible=False)
+            self.images[self.current_frame] = image
+        return image
+    
+    def show_current_frame(self) -> 'Image':
+        """Hide every display image except the current frame's and return it."""
+        current = self.image()
+        for image in self.images.values():
+            image.visible = False
+        current.visible = True
+        return current
+    
     def update_animation(self) -> None:
         """Update the imp's animation state."""
         if not self.visible:
@@ -74,13 +98,17 @@ class Imp(Enemy):
         """Update Imp position."""
         self.x += self.speed * math.cos(self.angle)
         self.y += self.speed * math.sin(self.angle)
+        if self.index is not None:
+            self.index.update(self)
         self.update_animation()
         
     def move_to(self, to) -> None:
         self.x = to[0]
         self.y = to[1]
-        print(f"moved to {self.x} {self.y}")
+        if self.index is not None:
+            self.index.update(self)
     
     def render(self) -> None:
         """Update Imp visibility."""
-        self.sprite.image.visible = self.visible
\ No newline at end of file
+        if self.current_frame in self.images:
+            self.images[self.current_frame].visible = self.visible
\ No newline at end of file
@@ -0,0 +1,77 @@
+import constants
+import utils
+import astar
+import game_map
+import heapq
+import math
+
+class FlowField:
+    """A Dijkstra map spreading out from one goal cell. Every cell stores the neighbouring cell that is one step closer to the goal,
+    so any number of enemies chasing the same goal can look up their next step without searching."""
+
+    def __init__(self):
+        self.goal = None
+        self.distances = []
+        self.next_cells = []
+        self._costs = None
+
+    def update(self, goal) -> bool:
+        """Recomputes the field if the goal moved to another cell or the map changed. Returns True if it was recomputed."""
+        goal = (int(goal[0]), int(goal[1]))
+        world = game_map.current_map()
+        width = world.width
+        costs = world.cost_table()
+        if goal == self.goal and costs is self._costs:
+            return False
+
+        self.goal = goal
+        self._costs = costs
+        self.distances = [math.inf] * len(costs)
+        self.next_cells = [None] * len(costs)
+
+        if not world.contains(*goal) or costs[utils.pack(goal)] == None:
+            return True
+
+        goal_packed = utils.pack(goal)
+        self.distances[goal_packed] = 0
+        open_set = [(0, goal_packed)]
+
+        while len(open_set) > 0:
+            distance, packed = heapq.heappop(open_set)
+            if distance > self.distances[packed]:
+                continue
+
+            pos = (packed % width, packed // width)
+            for offset in constants.ADJACENT_OFFSETS:
+                adj_pos = (pos[0] + offset[0], pos[1] + offset[1])
+
+                if not world.contains(*adj_pos):
+                    continue
+
+                adj_packed = adj_pos[1] * width + adj_pos[0]
+                if costs[adj_packed] == None:
+                    continue
+
+                # Walking from adj_pos back to pos pays the cost of entering pos
+                step_cost = costs[packed] * (astar.DIAGONAL_COST if offset[0] and offset[1] else 1)
+                score = distance + step_cost
+
+                if score < self.distances[adj_packed]:
+                    self.distances[adj_packed] = score
+                    self.next_cells[adj_packed] = pos
+                    heapq.heappush(open_set, (score, adj_packed))
+        return True
+
+    def next_step(self, pos):
+        """Returns the next cell on the way from pos to the goal, or None if the goal can't be reached from pos."""
+        pos = (int(pos[0]), int(pos[1]))
+        if not utils.is_inside_map(pos):
+            return None
+        return self.next_cells[utils.pack(pos)]
+
+    def distance(self, pos):
+        """Returns the path cost from pos to the goal, or infinity if the goal can't be reached from pos."""
+        pos = (int(pos[0]), int(pos[1]))
+        if not utils.is_inside_map(pos):
+            return math.inf
+        return self.distances[utils.pack(pos)]
@@ -0,0 +1,103 @@
+"""
+Software framebuffer renderer for PyDoom. Draws the world into a single NumPy RGB image instead of cmu_graphics shapes.
+"""
+
+from typing import Optional, Tuple
+import numpy as np
+from image_utils import encode_png
+
+def _scaled_indices(start: float, size: float, source_size: int, limit: int) -> Tuple[int, int, np.ndarray]:
+    """Map the on-screen span of a scaled image to nearest-neighbour source indices.
+
+    Args:
+        start: Screen coordinate of the image's first pixel
+        size: On-screen size of the image
+        source_size: Size of the source image along the same axis
+        limit: Screen size along the same axis
+
+    Returns:
+        Tuple of (first screen pixel, end screen pixel, source index per screen pixel)
+    """
+    first = max(0, int(start))
+    end = min(limit, int(start + size))
+    if end <= first or size <= 0:
+        return first, first, np.zeros(0, dtype=np.int64)
+    source = ((np.arange(first, end) - start) * (source_size / size)).astype(np.int64)
+    return first, end, np.clip(source, 0, source_size - 1)
+
+class FrameBuffer:
+    """An RGB image the world is rendered into."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def fill(self, color: Tuple[int, int, int], top: int = 0, bottom: Optional[int] = None) -> None:
+        """Fill a horizontal band of the framebuffer with one color.
+
+        Args:
+            color: RGB fill color
+            top: First row to fill
+            bottom: Row to stop at, defaults to the bottom of the framebuffer
+        """
+        self.pixels[top:bottom] = color
+
+    def draw_image(self, texture: np.ndarray, left: float, top: float, width: float, height: float,
+                   depth: Optional[float] = None, depth_buffer: Optional[np.ndarray] = None) -> None:
+        """Draw a scaled RGBA image, skipping transparent pixels.
+
+        When a depth and depth buffer are given, only the screen columns whose
+        depth buffer value is farther than the image are drawn.
+
+        Args:
+            texture: uint8 RGBA pixels of shape (height, width, 4)
+            left: Screen x of the image's left edge
+            top: Screen y of the image's top edge
+            width: On-screen width
+            height: On-screen height
+            depth: Distance of the image from the camera
+            depth_buffer: Per screen column wall distances
+        """
+        x0, x1, source_x = _scaled_indices(left, width, texture.shape[1], self.width)
+        y0, y1, source_y = _scaled_indices(top, height, texture.shape[0], self.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        # Picking columns then rows copies far less than indexing both at once
+        region = texture.take(source_x, axis=1).take(source_y, axis=0)
+        mask = region[..., 3] > 0
+        if depth is not None and depth_buffer is not None:
+            mask &= (depth_buffer[x0:x1] > depth)[None, :]
+        target = self.pixels[y0:y1, x0:x1]
+        if mask.all():
+            target[...] = region[..., :3]
+        else:
+            np.copyto(target, region[..., :3], where=mask[..., None])
+
+    def draw_columns(self, column_width: int, tops: np.ndarray, bottoms: np.ndarray, colors: np.ndarray) -> None:
+        """Draw solid vertical strips, one per column, starting at the left edge.
+
+        Args:
+            column_width: Width of each strip in pixels
+            tops: First row of each strip
+            bottoms: Row each strip stops at
+            colors: uint8 RGB color of each strip, shape (columns, 3)
+        """
+        count = len(tops)
+        tops = np.clip(np.ceil(tops), 0, self.height).astype(np.int64).tolist()
+        bottoms = np.clip(np.ceil(bottoms), 0, self.height).astype(np.int64).tolist()
+        colors = np.asarray(colors, dtype=np.uint8)
+        for column in range(min(count, -(-self.width // column_width))):
+            # The last strip stretches to the right edge if there are too few to cover it
+            left = column * column_width
+            right = left + column_width if column < count - 1 else self.width
+            self.pixels[tops[column]:bottoms[column], left:right] = colors[column]
+
+    def save(self, filepath: str) -> None:
+        """Write the framebuffer to a PNG file.
+
+        Args:
+            filepath: Path to write to
+        """
+        encode_png(filepath, self.pixels)
@@ -0,0 +1,416 @@
+"""
+Compact map representation for PyDoom. Tiles are stored as PosColor values in one flat byte buffer with lookup tables for their properties.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+import numpy as np
+import constants
+from constants import PosColor
+
+# Lookup tables indexed by PosColor value
+TILE_TYPES = sorted(PosColor, key=lambda tile: tile.value)
+PASSABLE = bytes(not tile.is_impassible() for tile in TILE_TYPES)
+COSTS = [tile.cost() for tile in TILE_TYPES]
+COLORS = [tile.color() for tile in TILE_TYPES]
+RGB = np.array([constants.RGB_MAP[tile] for tile in TILE_TYPES], dtype=np.uint8)
+
+# Most changed cells a map remembers, users further behind than this have to start over
+CHANGE_LOG_SIZE = 1024
+
+# Side length of the square chunks a ChunkedMap is split into, 64 * 64 one byte tiles fill one 4 KiB page
+CHUNK_SIZE = 64
+
+class ChangeLog:
+    """The most recently changed cells of a map, so things built from it can catch up without starting over.
+
+    Only the last CHANGE_LOG_SIZE changes are kept, so the log never grows
+    past that however long the map is played on.
+    """
+
+    def __init__(self, size: int = CHANGE_LOG_SIZE):
+        self.size = size
+        self.start = 0
+        self.cells = []
+
+    def record(self, x: int, y: int) -> None:
+        """Add a changed cell, dropping the oldest half of the log once it is full."""
+        self.cells.append((x, y))
+        if len(self.cells) > self.size:
+            dropped = len(self.cells) - self.size // 2
+            del self.cells[:dropped]
+            self.start += dropped
+
+    def since(self, version: int) -> Optional[list]:
+        """Get the cells changed after a map version.
+
+        Args:
+            version: Map version the caller last saw
+
+        Returns:
+            List of (x, y) cells in the order they changed, or None if changes that old are no longer kept
+        """
+        if version < self.start:
+            return None
+        return self.cells[version - self.start:]
+
+class MapRow:
+    """Read-only view of one map row that hands out PosColor members, for callers written against constants.MAP."""
+
+    def __init__(self, game_map: 'GameMap', y: int):
+        self.game_map = game_map
+        self.y = y
+
+    def __len__(self) -> int:
+        return self.game_map.width
+
+    def __getitem__(self, x: int) -> PosColor:
+        if not 0 <= x < self.game_map.width:
+            raise IndexError('map column out of range')
+        return self.game_map.tile(x, self.y)
+
+    def __iter__(self):
+        return (self.game_map.tile(x, self.y) for x in range(self.game_map.width))
+
+class GameMap:
+    """A rectangular grid of tiles stored row by row as one byte per tile.
+
+    Enemy spawns are (x, y, kind) tuples, the player start is an (x, y)
+    position or None to keep the default, and metadata holds any extra
+    level information such as a name. Every set_tile call bumps version and
+    records the cell in changes, see ChangeLog.
+    """
+
+    def __init__(self, width: int, height: int, cells: Optional[bytearray] = None):
+        """Create a map.
+
+        Args:
+            width: Number of columns
+            height: Number of rows
+            cells: Tile values row by row as a bytearray or writable memoryview, defaults to an empty map
+        """
+        if cells is None:
+            cells = bytearray(width * height)
+        if len(cells) != width * height:
+            raise ValueError(f"Expected {width * height} tiles, got {len(cells)}")
+
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.tiles = np.frombuffer(cells, dtype=np.uint8).reshape(height, width)
+        self.version = 0
+        self.changes = ChangeLog()
+        self.spawns = []
+        self.player_start = None
+        self.metadata = {}
+        self._cost_table = None
+        self._cost_table_version = None
+
+    @classmethod
+    def from_rows(cls, rows) -> 'GameMap':
+        """Build a map from nested lists of PosColor members like constants.MAP.
+
+        Args:
+            rows: List of rows, each a list of PosColor members
+
+        Returns:
+            The new map
+        """
+        height = len(rows)
+        width = len(rows[0]) if height else 0
+        if any(len(row) != width for row in rows):
+            raise ValueError('All map rows must be the same length')
+        return cls(width, height, bytearray(tile.value for row in rows for tile in row))
+
+    def contains(self, x: int, y: int) -> bool:
+        """Check if a cell is inside the map."""
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def value(self, x: int, y: int) -> int:
+        """Get the PosColor value stored at a cell."""
+        return self.cells[y * self.width + x]
+
+    def tile(self, x: int, y: int) -> PosColor:
+        """Get the PosColor member at a cell."""
+        return TILE_TYPES[self.cells[y * self.width + x]]
+
+    def is_passable(self, x: int, y: int) -> bool:
+        """Check if a cell can be walked through."""
+        return PASSABLE[self.cells[y * self.width + x]] == 1
+
+    def cost(self, x: int, y: int) -> Optional[int]:
+        """Get the pathfinding cost of a cell, or None if it's impassable."""
+        return COSTS[self.cells[y * self.width + x]]
+
+    def color(self, x: int, y: int) -> str:
+        """Get the fill color of a cell."""
+        return COLORS[self.cells[y * self.width + x]]
+
+    def set_tile(self, x: int, y: int, tile: PosColor) -> None:
+        """Change the tile at a cell.
+
+        Args:
+            x: Column of the cell
+            y: Row of the cell
+            tile: New tile
+        """
+        self.cells[y * self.width + x] = tile.value
+        self.changes.record(x, y)
+        self.version += 1
+
+    def cost_table(self) -> 'MapCosts':
+        """Get the pathfinding cost of every cell, indexed by y * width + x.
+
+        Costs are looked up from the cells as they're read, so nothing is
+        built or paged in up front. The same object is returned until the map
+        changes, so callers can tell when to redo work that depends on it.
+
+        Returns:
+            Sequence of costs, None for impassable cells
+        """
+        if self._cost_table_version != self.version:
+            self._cost_table = MapCosts(self.cells)
+            self._cost_table_version = self.version
+        return self._cost_table
+
+    def region(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """Get the tiles of a rectangle inside the map as an array indexed [y - top, x - left]."""
+        return self.tiles[top:bottom, left:right]
+
+    def window(self, x: float, y: float, radius: float) -> Tuple[np.ndarray, int, int]:
+        """Get tiles covering every cell within a radius of a point, for casting rays no longer than the radius.
+
+        The whole map is already in memory, so this is always the full tile array.
+
+        Args:
+            x: X coordinate of the point
+            y: Y coordinate of the point
+            radius: Distance from the point that has to be covered
+
+        Returns:
+            Tuple of (tiles indexed [y, x], map x of the first column, map y of the first row)
+        """
+        return self.tiles, 0, 0
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, y: int) -> MapRow:
+        if not 0 <= y < self.height:
+            raise IndexError('map row out of range')
+        return MapRow(self, y)
+
+    def __iter__(self):
+        return (MapRow(self, y) for y in range(self.height))
+
+class MapCosts:
+    """Pathfinding costs of a GameMap indexed by y * width + x, looked up from its cells on demand."""
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __getitem__(self, packed: int) -> Optional[int]:
+        return COSTS[self.cells[packed]]
+
+class ChunkedCosts:
+    """Pathfinding costs of a ChunkedMap indexed by y * width + x like GameMap.cost_table, looked up on demand."""
+
+    def __init__(self, game_map: 'ChunkedMap'):
+        self.game_map = game_map
+
+    def __len__(self) -> int:
+        return self.game_map.width * self.game_map.height
+
+    def __getitem__(self, packed: int) -> Optional[int]:
+        y, x = divmod(packed, self.game_map.width)
+        return COSTS[self.game_map.value(x, y)]
+
+class ChunkedMap:
+    """A map split into square chunks that are only loaded while they're being used.
+
+    Has the same interface as GameMap apart from the whole-map tiles and
+    cells buffers, so maps can be far larger than memory. The most recently
+    used chunks are kept in an LRU cache. Changed chunks are copied out of
+    the cache and kept for good, so edits are never lost to eviction and
+    never written back to the source.
+    """
+
+    def __init__(self, width: int, height: int, load_chunk: Callable[[int, int], bytes],
+                 chunk_size: int = CHUNK_SIZE, cache_size: int = 64):
+        """Create a map.
+
+        Args:
+            width: Number of columns
+            height: Number of rows
+            load_chunk: Function taking a chunk's (column, row) and returning its chunk_size * chunk_size tile values
+                row by row, chunks on the right and bottom edges are padded to full size
+            chunk_size: Side length of each chunk in cells
+            cache_size: Most unchanged chunks kept in memory
+        """
+        self.width = width
+        self.height = height
+        self.load_chunk = load_chunk
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.version = 0
+        self.changes = ChangeLog()
+        self.spawns = []
+        self.player_start = None
+        self.metadata = {}
+        self.loads = 0
+        self._chunks = OrderedDict()
+        self._modified = {}
+        self._last_key = None
+        self._last_chunk = None
+        self._costs = ChunkedCosts(self)
+        self._costs_version = 0
+        self._window = None
+        self._window_key = None
+
+    def chunk(self, chunk_x: int, chunk_y: int) -> bytes:
+        """Get the tile values of one chunk row by row, loading it if it isn't cached."""
+        key = (chunk_x, chunk_y)
+        chunk = self._modified.get(key)
+        if chunk is None:
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                chunk = self.load_chunk(chunk_x, chunk_y)
+                self.loads += 1
+                self._chunks[key] = chunk
+                if len(self._chunks) > self.cache_size:
+                    self._chunks.popitem(last=False)
+            else:
+                self._chunks.move_to_end(key)
+        self._last_key = key
+        self._last_chunk = chunk
+        return chunk
+
+    def contains(self, x: int, y: int) -> bool:
+        """Check if a cell is inside the map."""
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def value(self, x: int, y: int) -> int:
+        """Get the PosColor value stored at a cell."""
+        size = self.chunk_size
+        key = (x // size, y // size)
+        # Neighbouring lookups nearly always land in the same chunk
+        chunk = self._last_chunk if key == self._last_key else self.chunk(*key)
+        return chunk[(y % size) * size + x % size]
+
+    def tile(self, x: int, y: int) -> PosColor:
+        """Get the PosColor member at a cell."""
+        return TILE_TYPES[self.value(x, y)]
+
+    def is_passable(self, x: int, y: int) -> bool:
+        """Check if a cell can be walked through."""
+        return PASSABLE[self.value(x, y)] == 1
+
+    def cost(self, x: int, y: int) -> Optional[int]:
+        """Get the pathfinding cost of a cell, or None if it's impassable."""
+        return COSTS[self.value(x, y)]
+
+    def color(self, x: int, y: int) -> str:
+        """Get the fill color of a cell."""
+        return COLORS[self.value(x, y)]
+
+    def set_tile(self, x: int, y: int, tile: PosColor) -> None:
+        """Change the tile at a cell.
+
+        Args:
+            x: Column of the cell
+            y: Row of the cell
+            tile: New tile
+        """
+        size = self.chunk_size
+        key = (x // size, y // size)
+        chunk = self._modified.get(key)
+        if chunk is None:
+            chunk = bytearray(self.chunk(*key))
+            self._chunks.pop(key, None)
+            self._modified[key] = chunk
+            self._last_key = key
+            self._last_chunk = chunk
+        chunk[(y % size) * size + x % size] = tile.value
+        self.changes.record(x, y)
+        self.version += 1
+
+    def cost_table(self) -> ChunkedCosts:
+        """Get the pathfinding cost of every cell, indexed by y * width + x.
+
+        The same object is returned until the map changes, like GameMap.cost_table.
+
+        Returns:
+            Sequence of costs, None for impassable cells
+        """
+        if self._costs_version != self.version:
+            self._costs = ChunkedCosts(self)
+            self._costs_version = self.version
+        return self._costs
+
+    def region(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """Get the tiles of a rectangle inside the map as an array indexed [y - top, x - left], loading its chunks."""
+        size = self.chunk_size
+        tiles = np.empty((bottom - top, right - left), dtype=np.uint8)
+        for chunk_y in range(top // size, (bottom - 1) // size + 1):
+            for chunk_x in range(left // size, (right - 1) // size + 1):
+                chunk = np.frombuffer(self.chunk(chunk_x, chunk_y), dtype=np.uint8).reshape(size, size)
+                x0, y0 = chunk_x * size, chunk_y * size
+                x1, y1 = max(left, x0), max(top, y0)
+                x2, y2 = min(right, x0 + size), min(bottom, y0 + size)
+                tiles[y1 - top:y2 - top, x1 - left:x2 - left] = chunk[y1 - y0:y2 - y0, x1 - x0:x2 - x0]
+        return tiles
+
+    def window(self, x: float, y: float, radius: float) -> Tuple[np.ndarray, int, int]:
+        """Get tiles covering every cell within a radius of a point, for casting rays no longer than the radius.
+
+        The window is whole chunks clipped to the map, and is only rebuilt
+        when the point crosses into other chunks or the map changes.
+
+        Args:
+            x: X coordinate of the point
+            y: Y coordinate of the point
+            radius: Distance from the point that has to be covered
+
+        Returns:
+            Tuple of (tiles indexed [y - top, x - left], left, top)
+        """
+        size = self.chunk_size
+        left = max(0, int(x - radius)) // size * size
+        top = max(0, int(y - radius)) // size * size
+        right = min(self.width, (int(x + radius) // size + 1) * size)
+        bottom = min(self.height, (int(y + radius) // size + 1) * size)
+
+        key = (left, top, right, bottom, self.version)
+        if key != self._window_key:
+            self._window = self.region(left, top, right, bottom)
+            self._window.flags.writeable = False
+            self._window_key = key
+        return self._window, left, top
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, y: int) -> MapRow:
+        if not 0 <= y < self.height:
+            raise IndexError('map row out of range')
+        return MapRow(self, y)
+
+    def __iter__(self):
+        return (MapRow(self, y) for y in range(self.height))
+
+_current = None
+
+def current_map() -> GameMap:
+    """Get the map the game is played on, built from constants.MAP on first use."""
+    global _current
+    if _current is None:
+        _current = GameMap.from_rows(constants.MAP)
+    return _current
+
+def set_current_map(game_map: GameMap) -> None:
+    """Replace the map the game is played on."""
+    global _current
+    _current = game_map
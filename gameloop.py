@@ -0,0 +1,73 @@
+"""
+Fixed-timestep game loop for PyDoom. The simulation always advances in ticks of the same length, however long
+rendering takes, and rendering is told how far between two ticks it is so it can interpolate.
+"""
+
+import time
+from typing import Callable
+
+class GameLoop:
+    """Runs whole simulation ticks for the real time that has passed, then renders once.
+
+    Time left over that doesn't fill a whole tick is carried to the next
+    frame, and the fraction of a tick it represents is passed to render so
+    the view can be interpolated between the last two simulated states.
+    """
+
+    def __init__(self, simulate: Callable[[], None], render: Callable[[float], None], tick_rate: float = 30,
+                 max_ticks_per_frame: int = 5, clock: Callable[[], float] = time.perf_counter):
+        """Create a loop.
+
+        Args:
+            simulate: Advances the game by one tick
+            render: Draws the game, given how far past the last tick the frame is, from 0 to 1
+            tick_rate: Simulation ticks per second
+            max_ticks_per_frame: Most ticks run in one frame, extra time is dropped so a very slow frame
+                can't make every following frame slower
+            clock: Function returning the current time in seconds
+        """
+        self.simulate = simulate
+        self.render = render
+        self.tick_length = 1 / tick_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.clock = clock
+        self.accumulator = 0.0
+        self.last_time = None
+        self.ticks = 0
+
+    @property
+    def alpha(self) -> float:
+        """How far the current time is past the last tick, as a fraction of a tick."""
+        return self.accumulator / self.tick_length
+
+    def frame(self) -> int:
+        """Run the ticks that are due and render once.
+
+        Returns:
+            Number of ticks that were run
+        """
+        now = self.clock()
+        # The first frame runs exactly one tick
+        elapsed = self.tick_length if self.last_time is None else now - self.last_time
+        self.last_time = now
+        self.accumulator = min(self.accumulator + elapsed, self.tick_length * self.max_ticks_per_frame)
+
+        ticks = 0
+        while self.accumulator >= self.tick_length:
+            self.simulate()
+            self.accumulator -= self.tick_length
+            ticks += 1
+        self.ticks += ticks
+
+        self.render(self.alpha)
+        return ticks
+
+    def run(self, ticks: int) -> None:
+        """Run the simulation alone as fast as possible, without rendering or looking at the clock.
+
+        Args:
+            ticks: Number of ticks to run
+        """
+        for _ in range(ticks):
+            self.simulate()
+        self.ticks += ticks
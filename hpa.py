@@ -0,0 +1,389 @@
+"""
+Hierarchical pathfinding (HPA*) for PyDoom. Splits the map into square clusters joined by entrances, searches the
+small graph of entrances between them and only walks the map cell by cell for the first leg of a route.
+"""
+
+import heapq
+import math
+from typing import Dict, Iterator, List, Optional, Tuple
+import astar
+import constants
+import game_map
+
+CLUSTER_SIZE = 16
+WIDE_ENTRANCE = 6 # Entrances at least this many cells wide get a transition at each end instead of one in the middle
+
+Cell = Tuple[int, int]
+
+class Cluster:
+    """The entrance cells of one cluster and what they connect to.
+
+    Links are the steps across the cluster's borders into neighbouring
+    clusters, and edges are the costs of the cheapest paths between two
+    entrance cells that stay inside the cluster. Searches inside the
+    cluster run on a copy of its costs padded with a ring of impassable
+    cells, indexed by local index rather than cell.
+    """
+
+    def __init__(self, world, bounds: Tuple[int, int, int, int]):
+        self.bounds = bounds
+        self.links: Dict[Cell, List[Tuple[Cell, float]]] = {}
+        self.edges: Dict[Cell, List[Tuple[Cell, float]]] = {}
+
+        left, top, right, bottom = bounds
+        self.stride = right - left + 2
+        self.costs = [None] * self.stride
+        for row in world.region(left, top, right, bottom).tolist():
+            self.costs.append(None)
+            self.costs.extend(game_map.COSTS[value] for value in row)
+            self.costs.append(None)
+        self.costs.extend([None] * self.stride)
+        self.steps = [(dy * self.stride + dx, astar.DIAGONAL_COST if dx and dy else 1)
+                      for dx, dy in constants.ADJACENT_OFFSETS]
+
+    def index(self, cell: Cell) -> int:
+        """Get the local index of a cell in the cluster."""
+        return (cell[1] - self.bounds[1] + 1) * self.stride + cell[0] - self.bounds[0] + 1
+
+    def cell(self, index: int) -> Cell:
+        """Get the cell at a local index."""
+        y, x = divmod(index, self.stride)
+        return (x - 1 + self.bounds[0], y - 1 + self.bounds[1])
+
+    def search(self, source: Cell, reverse: bool = False) -> Tuple[List[float], List[int]]:
+        """Find the cheapest paths from one cell to every cell it can reach without leaving the cluster.
+
+        Args:
+            source: Cell in the cluster to search from
+            reverse: Find the cheapest paths to the source instead of from it
+
+        Returns:
+            Tuple of (cost of reaching each local index, infinite if unreachable, and the local index each was
+            reached from)
+        """
+        costs = self.costs
+        steps = self.steps
+        distances = [math.inf] * len(costs)
+        parents = [-1] * len(costs)
+        start = self.index(source)
+        distances[start] = 0
+        open_set = [(0, start)]
+
+        while open_set:
+            distance, index = heapq.heappop(open_set)
+            if distance > distances[index]:
+                continue
+            index_cost = costs[index]
+
+            for step, factor in steps:
+                adj = index + step
+                adj_cost = costs[adj]
+                if adj_cost is None:
+                    continue
+
+                # Walking from adj back to index pays the cost of entering index
+                score = distance + (index_cost if reverse else adj_cost) * factor
+                if score < distances[adj]:
+                    distances[adj] = score
+                    parents[adj] = index
+                    heapq.heappush(open_set, (score, adj))
+        return distances, parents
+
+class HierarchicalPathfinder:
+    """HPA* over the current map.
+
+    Clusters and the entrances on their borders are worked out the first
+    time a search reaches them, or ahead of time by build(), which can be
+    spread over many calls so a huge map never stalls a frame. Searches
+    reaching an unbuilt cluster still build it on the spot, so complete
+    tells callers when searching no longer builds anything. When tiles
+    change, only the clusters containing them, and the neighbours sharing a
+    changed border, are dropped to be rebuilt.
+    """
+
+    def __init__(self, cluster_size: int = CLUSTER_SIZE):
+        """Create a pathfinder.
+
+        Args:
+            cluster_size: Side length of each cluster in cells
+        """
+        self.cluster_size = cluster_size
+        self.world = None
+        self.version = 0
+        self.clusters: Dict[Cell, Cluster] = {}
+        self.borders: Dict[Tuple[int, int, int], List[Tuple[Cell, Cell]]] = {}
+        self._goal = None
+        self._goal_edges = None
+        self._build_cursor = 0
+        self.complete = False
+
+    def find_path(self, from_pos, to) -> Optional[List[Cell]]:
+        """Find the first leg of a route from one position to another, cell by cell.
+
+        Args:
+            from_pos: Position to start from
+            to: Position to reach
+
+        Returns:
+            The cells from the start to the first waypoint of the route, or to the goal when the route to it stays
+            in the start's cluster, including both ends. None if there's no route.
+        """
+        start = (int(from_pos[0]), int(from_pos[1]))
+        route = self._search(start, (int(to[0]), int(to[1])))
+        if route is None:
+            return None
+        waypoints, start_cluster, parents = route
+        if len(waypoints) == 1:
+            return waypoints
+
+        # The first waypoint is either across a border from the start, or was reached by the search around the start
+        first = waypoints[1]
+        left, top, right, bottom = start_cluster.bounds
+        if not (left <= first[0] < right and top <= first[1] < bottom):
+            return [start, first]
+        path = [start_cluster.index(first)]
+        while path[-1] != start_cluster.index(start):
+            path.append(parents[path[-1]])
+        path.reverse()
+        return [start_cluster.cell(index) for index in path]
+
+    def waypoints(self, from_pos, to) -> Optional[List[Cell]]:
+        """Find a route from one position to another through cluster entrances.
+
+        Args:
+            from_pos: Position to start from
+            to: Position to reach
+
+        Returns:
+            The start, the entrance cells the route passes through and the goal, or None if there's no route
+        """
+        route = self._search((int(from_pos[0]), int(from_pos[1])), (int(to[0]), int(to[1])))
+        return route[0] if route is not None else None
+
+    def build(self, limit: Optional[int] = None, around: Optional[Cell] = None) -> bool:
+        """Build clusters ahead of the searches that need them, in row order.
+
+        Also rebuilds clusters dropped by tile changes since the last call.
+
+        Args:
+            limit: Most clusters to build in this call, None builds all of them
+            around: Cell whose cluster and the eight around it are built before any others
+
+        Returns:
+            True if every cluster is built
+        """
+        world = self._sync()
+        size = self.cluster_size
+        clusters_across = -(-world.width // size)
+        clusters_down = -(-world.height // size)
+        total = clusters_across * clusters_down
+        built = 0
+        if around is not None:
+            centre_x, centre_y = around[0] // size, around[1] // size
+            for cluster_y in range(max(0, centre_y - 1), min(clusters_down, centre_y + 2)):
+                for cluster_x in range(max(0, centre_x - 1), min(clusters_across, centre_x + 2)):
+                    if (cluster_x, cluster_y) not in self.clusters:
+                        if limit is not None and built >= limit:
+                            return False
+                        self._cluster(world, cluster_x, cluster_y)
+                        built += 1
+        while self._build_cursor < total:
+            cluster_y, cluster_x = divmod(self._build_cursor, clusters_across)
+            if (cluster_x, cluster_y) not in self.clusters:
+                if limit is not None and built >= limit:
+                    return False
+                self._cluster(world, cluster_x, cluster_y)
+                built += 1
+            self._build_cursor += 1
+        self.complete = True
+        return True
+
+    def tile_changed(self, x: int, y: int) -> None:
+        """Drop the parts of the abstraction a changed tile can affect so they're rebuilt when next needed.
+
+        Args:
+            x: Column of the tile
+            y: Row of the tile
+        """
+        size = self.cluster_size
+        cluster_x, cluster_y = x // size, y // size
+        self.clusters.pop((cluster_x, cluster_y), None)
+        self._goal = None
+        self._build_cursor = 0
+        self.complete = False
+
+        # A tile on a cluster's edge can open or close an entrance, which changes the cluster across it too
+        if x % size == 0:
+            self._drop_border(0, cluster_x - 1, cluster_y)
+        if x % size == size - 1:
+            self._drop_border(0, cluster_x, cluster_y)
+        if y % size == 0:
+            self._drop_border(1, cluster_x, cluster_y - 1)
+        if y % size == size - 1:
+            self._drop_border(1, cluster_x, cluster_y)
+
+    def _drop_border(self, axis: int, cluster_x: int, cluster_y: int) -> None:
+        self.borders.pop((axis, cluster_x, cluster_y), None)
+        self.clusters.pop((cluster_x, cluster_y), None)
+        self.clusters.pop((cluster_x + 1, cluster_y) if axis == 0 else (cluster_x, cluster_y + 1), None)
+
+    def _sync(self) -> game_map.GameMap:
+        """Catch up with the current map, starting over if it's a different map or too many tiles changed."""
+        world = game_map.current_map()
+        if world is not self.world:
+            self._reset(world)
+        elif world.version != self.version:
+            changes = world.changes.since(self.version)
+            if changes is None:
+                self._reset(world)
+            else:
+                for x, y in changes:
+                    self.tile_changed(x, y)
+                self.version = world.version
+        return world
+
+    def _reset(self, world) -> None:
+        """Forget the whole abstraction and start over on a map."""
+        self.world = world
+        self.version = world.version
+        self.clusters.clear()
+        self.borders.clear()
+        self._goal = None
+        self._build_cursor = 0
+        self.complete = False
+
+    def _search(self, start: Cell, goal: Cell) -> Optional[Tuple[List[Cell], Cluster, List[int]]]:
+        """Search the abstract graph, returning the waypoints, the start's cluster and the search tree in it."""
+        world = self._sync()
+        if not world.contains(*start) or not world.contains(*goal):
+            return None
+        costs = world.cost_table()
+        if costs[goal[1] * world.width + goal[0]] is None:
+            return None
+        if start == goal:
+            return [start], None, []
+
+        start_cluster = self._cluster(world, start[0] // self.cluster_size, start[1] // self.cluster_size)
+        start_distances, parents = start_cluster.search(start)
+        start_edges = [(node, start_distances[start_cluster.index(node)]) for node in start_cluster.links
+                       if node != start and start_distances[start_cluster.index(node)] < math.inf]
+        start_edges.extend(start_cluster.links.get(start, ()))
+        if start_cluster is self._cluster(world, goal[0] // self.cluster_size, goal[1] // self.cluster_size):
+            if start_distances[start_cluster.index(goal)] < math.inf:
+                start_edges.append((goal, start_distances[start_cluster.index(goal)]))
+
+        # Every enemy chases the same goal, so its connections to its cluster's entrances are kept until it moves
+        if self._goal != goal:
+            goal_cluster = self._cluster(world, goal[0] // self.cluster_size, goal[1] // self.cluster_size)
+            goal_distances, _ = goal_cluster.search(goal, reverse=True)
+            self._goal_edges = {node: goal_distances[goal_cluster.index(node)] for node in goal_cluster.links
+                                if goal_distances[goal_cluster.index(node)] < math.inf}
+            self._goal = goal
+        goal_edges = self._goal_edges
+
+        g_scores = {start: 0}
+        from_cells = {}
+        closed = set()
+        open_set = [(astar.h_score(start, goal), 0, start)]
+
+        while open_set:
+            _, g_score, cell = heapq.heappop(open_set)
+
+            if cell == goal:
+                waypoints = [goal]
+                while waypoints[-1] != start:
+                    waypoints.append(from_cells[waypoints[-1]])
+                waypoints.reverse()
+                return waypoints, start_cluster, parents
+
+            if cell in closed:
+                continue
+            closed.add(cell)
+
+            for other, cost in self._neighbours(world, cell, start, start_edges, goal, goal_edges):
+                score = g_score + cost
+                if other not in closed and score < g_scores.get(other, math.inf):
+                    g_scores[other] = score
+                    from_cells[other] = cell
+                    heapq.heappush(open_set, (score + astar.h_score(other, goal), score, other))
+        return None
+
+    def _neighbours(self, world, cell: Cell, start: Cell, start_edges: list, goal: Cell,
+                    goal_edges: Dict[Cell, float]) -> Iterator[Tuple[Cell, float]]:
+        """Get the cells one abstract edge away from a cell, with the cost of getting to each."""
+        if cell == start:
+            yield from start_edges
+        else:
+            cluster = self._cluster(world, cell[0] // self.cluster_size, cell[1] // self.cluster_size)
+            yield from cluster.edges.get(cell, ())
+            yield from cluster.links.get(cell, ())
+        if cell in goal_edges:
+            yield goal, goal_edges[cell]
+
+    def _cluster(self, world, cluster_x: int, cluster_y: int) -> Cluster:
+        """Get a cluster, working out its entrances and the paths between them on first use."""
+        cluster = self.clusters.get((cluster_x, cluster_y))
+        if cluster is not None:
+            return cluster
+
+        size = self.cluster_size
+        cluster = Cluster(world, (cluster_x * size, cluster_y * size,
+                                  min(world.width, (cluster_x + 1) * size), min(world.height, (cluster_y + 1) * size)))
+        costs = world.cost_table()
+
+        def link(inside: Cell, across: Cell) -> None:
+            cluster.links.setdefault(inside, []).append((across, costs[across[1] * world.width + across[0]]))
+
+        for inside, across in self._border(world, costs, 0, cluster_x, cluster_y):
+            link(inside, across)
+        for inside, across in self._border(world, costs, 1, cluster_x, cluster_y):
+            link(inside, across)
+        for across, inside in self._border(world, costs, 0, cluster_x - 1, cluster_y):
+            link(inside, across)
+        for across, inside in self._border(world, costs, 1, cluster_x, cluster_y - 1):
+            link(inside, across)
+
+        for node in cluster.links:
+            distances, _ = cluster.search(node)
+            cluster.edges[node] = [(other, distances[cluster.index(other)]) for other in cluster.links
+                                   if other != node and distances[cluster.index(other)] < math.inf]
+
+        self.clusters[(cluster_x, cluster_y)] = cluster
+        return cluster
+
+    def _border(self, world, costs, axis: int, cluster_x: int, cluster_y: int) -> List[Tuple[Cell, Cell]]:
+        """Get the transitions from a cluster into the one to its right (axis 0) or below it (axis 1).
+
+        Returns:
+            List of (cell in the cluster, cell across the border) pairs, one or two per open stretch of border
+        """
+        key = (axis, cluster_x, cluster_y)
+        transitions = self.borders.get(key)
+        if transitions is not None:
+            return transitions
+
+        size = self.cluster_size
+        pairs = []
+        if axis == 0:
+            line = (cluster_x + 1) * size - 1
+            if cluster_x >= 0 and line + 1 < world.width:
+                pairs = [((line, y), (line + 1, y)) for y in range(cluster_y * size, min(world.height, (cluster_y + 1) * size))]
+        else:
+            line = (cluster_y + 1) * size - 1
+            if cluster_y >= 0 and line + 1 < world.height:
+                pairs = [((x, line), (x, line + 1)) for x in range(cluster_x * size, min(world.width, (cluster_x + 1) * size))]
+
+        transitions = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and all(costs[y * world.width + x] is not None for x, y in pair):
+                run.append(pair)
+                continue
+            if len(run) >= WIDE_ENTRANCE:
+                transitions.extend((run[0], run[-1]))
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+
+        self.borders[key] = transitions
+        return transitions
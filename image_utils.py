@@ -1,20 +1,136 @@
+import json
+import os
 import struct
-from typing import Tuple
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+MANIFEST_VERSION = 1
+
+@dataclass(frozen=True)
+class PngInfo:
+    """Class to hold the image metadata stored in a PNG's IHDR chunk."""
+    width: int
+    height: int
+    bit_depth: int
+    color_type: int
+
+def read_png_info(filepath: str) -> PngInfo:
+    """Read a PNG's metadata from its IHDR chunk without reading the image data.
+
+    Args:
+        filepath: Path to the PNG file
+
+    Returns:
+        The image's dimensions, bit depth and color type
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read(29)  # signature, IHDR length and type, then the 13 byte IHDR body
+
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError('Not a PNG file')
+    if len(data) < 29 or data[12:16] != b'IHDR':
+        raise ValueError('PNG file is missing its IHDR chunk')
+
+    w, h, bit_depth, color_type = struct.unpack('>LLBB', data[16:26])
+    return PngInfo(int(w), int(h), bit_depth, color_type)
 
 def get_png_dimensions(filepath: str) -> Tuple[int, int]:
     """Get the dimensions of a PNG file.
-    
+
     Args:
         filepath: Path to the PNG file
-        
+
     Returns:
         Tuple of (width, height)
     """
-    with open(filepath, 'rb') as f:
-        data = f.read()
-        
-    if data[:8] != b'\x89PNG\r\n\x1a\n':
-        raise ValueError('Not a PNG file')
-        
-    w, h = struct.unpack('>LL', data[16:24])
-    return int(w), int(h)
+    info = read_png_info(filepath)
+    return info.width, info.height
+
+def scan_png_directory(directory: str, manifest_path: Optional[str] = None) -> Dict[str, PngInfo]:
+    """Probe every PNG under a directory, reusing a saved manifest for files that haven't changed.
+
+    A file is only probed again when its size or modification time differs
+    from the manifest. The manifest is rewritten when anything changed, by
+    writing a temporary file and renaming it over the old one so a crash
+    never leaves half a manifest. A manifest that can't be written, such as
+    in a read-only install, is skipped and the files are probed next time.
+
+    Args:
+        directory: Directory to scan recursively
+        manifest_path: JSON manifest to read and update, or None to always probe
+
+    Returns:
+        Dictionary from normalized file path to its metadata
+    """
+    previous = {}
+    if manifest_path and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                previous = {entry['path']: entry for entry in manifest['files']}
+        except (OSError, ValueError, KeyError):
+            previous = {}
+
+    entries = []
+    infos = {}
+    changed = False
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if not filename.lower().endswith('.png'):
+                continue
+            filepath = os.path.normpath(os.path.join(root, filename))
+            stat = os.stat(filepath)
+
+            entry = previous.get(filepath)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                entry = {'path': filepath, 'size': stat.st_size, 'mtime': stat.st_mtime, **asdict(read_png_info(filepath))}
+                changed = True
+            entries.append(entry)
+            infos[filepath] = PngInfo(entry['width'], entry['height'], entry['bit_depth'], entry['color_type'])
+
+    if manifest_path and (changed or len(entries) != len(previous)):
+        temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, indent=1)
+            os.replace(temp_path, manifest_path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+    return infos
+
+def decode_png(filepath: str) -> np.ndarray:
+    """Decode a PNG file into pixels.
+
+    Args:
+        filepath: Path to the PNG file
+
+    Returns:
+        uint8 array of shape (height, width, 4) holding RGBA pixels
+    """
+    # Imported here so probing PNG headers works without Pillow
+    from PIL import Image as PILImage
+    with PILImage.open(filepath) as image:
+        return np.array(image.convert('RGBA'))
+
+def encode_png(filepath: str, pixels: np.ndarray) -> None:
+    """Write RGB or RGBA pixels to a PNG file.
+
+    Args:
+        filepath: Path to write to
+        pixels: uint8 array of shape (height, width, 3) or (height, width, 4)
+    """
+    from PIL import Image as PILImage
+    PILImage.fromarray(np.ascontiguousarray(pixels, dtype=np.uint8)).save(filepath, format='PNG')
+
+if __name__ == '__main__':
+    import sys
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'assets'
+    manifest_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(directory, 'manifest.json')
+    for filepath, info in scan_png_directory(directory, manifest_path).items():
+        print(f"{filepath}: {info.width}x{info.height}, bit depth {info.bit_depth}, color type {info.color_type}")
@@ -0,0 +1,306 @@
+"""
+Level loading for PyDoom. Reads rectangular maps of any size from text, NumPy or PyDoom binary level files into a GameMap.
+
+Text levels have one line per map row and one character per tile:
+
+    .  empty floor
+    #  light wall
+    %  dark wall
+    @  portal
+    I  empty floor with an Imp spawn
+    S  empty floor where the player starts
+
+Binary levels (.pdl) are little-endian: a fixed header, then the tiles
+row by row at one byte each, then the spawn table, then UTF-8 JSON
+metadata. They are memory-mapped, so opening one takes the same time at
+any size and tile pages are only read from disk when touched.
+
+    header   magic b'PDLV', version u16, flags u16, width u32, height u32,
+             spawn count u32, metadata size u32
+    tiles    width * height u8 tile values
+    spawns   spawn count entries of x u32, y u32, kind u8
+    metadata metadata size bytes of JSON
+
+With the chunked flag set, the tiles are stored as CHUNK_SIZE x CHUNK_SIZE
+chunks instead, chunk rows top to bottom, each chunk's tiles row by row,
+with the chunks on the right and bottom edges padded with walls. A chunk
+is one contiguous page, and chunked levels open as a ChunkedMap that only
+reads the chunks around where they're used.
+
+Convert a level, or the built-in constants.MAP when no input is given:
+
+    python levels.py convert [--chunked] [input] output.pdl
+"""
+
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import numpy as np
+import constants
+from constants import PosColor
+from game_map import CHUNK_SIZE, ChunkedMap, GameMap
+
+TILE_CHARS = {
+    '.': PosColor.EMPTY,
+    '#': PosColor.LIGHTWALL,
+    '%': PosColor.DARKWALL,
+    '@': PosColor.Portal,
+}
+SPAWN_CHARS = {
+    'I': 'imp',
+}
+PLAYER_START_CHAR = 'S'
+
+BINARY_MAGIC = b'PDLV'
+BINARY_VERSION = 1
+BINARY_CHUNKED = 1
+BINARY_HEADER = struct.Struct('<4sHHIIII')
+BINARY_SPAWN = np.dtype([('x', '<u4'), ('y', '<u4'), ('kind', 'u1')])
+SPAWN_KINDS = ['imp']
+
+# Byte translation table from level characters to tile values, 255 marks an unknown character
+_TEXT_TABLE = bytearray([255] * 256)
+for char, tile in TILE_CHARS.items():
+    _TEXT_TABLE[ord(char)] = tile.value
+for char in list(SPAWN_CHARS) + [PLAYER_START_CHAR]:
+    _TEXT_TABLE[ord(char)] = PosColor.EMPTY.value
+_TEXT_TABLE = bytes(_TEXT_TABLE)
+
+_TILE_CHARS_BY_VALUE = {tile.value: char for char, tile in TILE_CHARS.items()}
+
+def load_level(filepath: str) -> GameMap:
+    """Load a level, picking the format from the file extension.
+
+    Args:
+        filepath: Path to a .txt, .npy or .pdl level
+
+    Returns:
+        The loaded map
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == '.txt':
+        return load_text(filepath)
+    if extension == '.npy':
+        return load_npy(filepath)
+    if extension == '.pdl':
+        return load_binary(filepath)
+    raise ValueError(f"Unknown level format: {filepath}")
+
+def load_text(filepath: str) -> GameMap:
+    """Load a text level.
+
+    Args:
+        filepath: Path to the level file
+
+    Returns:
+        The loaded map, with spawns and player start filled in
+    """
+    with open(filepath, 'rb') as f:
+        lines = f.read().splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if not lines:
+        raise ValueError(f"Empty level: {filepath}")
+
+    width = len(lines[0])
+    cells = bytearray()
+    spawns = []
+    player_start = None
+
+    for y, line in enumerate(lines):
+        if len(line) != width:
+            raise ValueError(f"Row {y} of {filepath} is {len(line)} tiles wide, expected {width}")
+        row = line.translate(_TEXT_TABLE)
+        if 255 in row:
+            raise ValueError(f"Unknown tile {chr(line[row.index(255)])!r} in row {y} of {filepath}")
+        cells += row
+
+        for char, kind in SPAWN_CHARS.items():
+            x = line.find(ord(char))
+            while x != -1:
+                spawns.append((x, y, kind))
+                x = line.find(ord(char), x + 1)
+        x = line.find(ord(PLAYER_START_CHAR))
+        if x != -1:
+            player_start = (x + 0.5, y + 0.5)
+
+    game_map = GameMap(width, len(lines), cells)
+    game_map.spawns = spawns
+    game_map.player_start = player_start
+    return game_map
+
+def save_text(game_map: GameMap, filepath: str) -> None:
+    """Write a map as a text level.
+
+    Args:
+        game_map: Map to write
+        filepath: Path to write to
+    """
+    rows = [[_TILE_CHARS_BY_VALUE[value] for value in row] for row in game_map.tiles.tolist()]
+    spawn_chars = {kind: char for char, kind in SPAWN_CHARS.items()}
+    for x, y, kind in game_map.spawns:
+        rows[y][x] = spawn_chars[kind]
+    if game_map.player_start is not None:
+        rows[int(game_map.player_start[1])][int(game_map.player_start[0])] = PLAYER_START_CHAR
+
+    with open(filepath, 'w') as f:
+        f.write('\n'.join(''.join(row) for row in rows) + '\n')
+
+def load_npy(filepath: str) -> GameMap:
+    """Load a level saved as a 2D NumPy array of tile values.
+
+    Args:
+        filepath: Path to the .npy file
+
+    Returns:
+        The loaded map
+    """
+    tiles = np.load(filepath)
+    if tiles.ndim != 2:
+        raise ValueError(f"Expected a 2D tile array in {filepath}, got shape {tiles.shape}")
+    if tiles.size and tiles.max() >= len(PosColor):
+        raise ValueError(f"Unknown tile value {tiles.max()} in {filepath}")
+    height, width = tiles.shape
+    return GameMap(width, height, bytearray(tiles.astype(np.uint8).tobytes()))
+
+def save_npy(game_map: GameMap, filepath: str) -> None:
+    """Write a map's tiles as a 2D NumPy array.
+
+    Args:
+        game_map: Map to write
+        filepath: Path to write to
+    """
+    np.save(filepath, game_map.tiles)
+
+def load_binary(filepath: str, cache_size: int = 64) -> GameMap:
+    """Open a binary level by memory-mapping it.
+
+    The tiles are copy-on-write, so changing them in game never touches the file.
+
+    Args:
+        filepath: Path to the .pdl file
+        cache_size: Most chunks a chunked level keeps copied out of the file
+
+    Returns:
+        The loaded map, a ChunkedMap if the level is chunked
+    """
+    with open(filepath, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    if len(mapped) < BINARY_HEADER.size:
+        raise ValueError(f"Truncated level header in {filepath}")
+    magic, version, flags, width, height, spawn_count, metadata_size = BINARY_HEADER.unpack_from(mapped)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"Not a PyDoom level: {filepath}")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported level version {version} in {filepath}")
+
+    chunked = flags & BINARY_CHUNKED
+    chunks_across = -(-width // CHUNK_SIZE)
+    chunk_bytes = CHUNK_SIZE * CHUNK_SIZE
+    tiles_start = BINARY_HEADER.size
+    tiles_size = chunks_across * -(-height // CHUNK_SIZE) * chunk_bytes if chunked else width * height
+    spawns_start = tiles_start + tiles_size
+    metadata_start = spawns_start + spawn_count * BINARY_SPAWN.itemsize
+    if len(mapped) < metadata_start + metadata_size:
+        raise ValueError(f"Truncated level data in {filepath}")
+
+    if chunked:
+        def load_chunk(chunk_x: int, chunk_y: int) -> bytes:
+            start = tiles_start + (chunk_y * chunks_across + chunk_x) * chunk_bytes
+            return mapped[start:start + chunk_bytes]
+        game_map = ChunkedMap(width, height, load_chunk, CHUNK_SIZE, cache_size)
+    else:
+        game_map = GameMap(width, height, memoryview(mapped)[tiles_start:spawns_start])
+
+    spawns = np.frombuffer(mapped, dtype=BINARY_SPAWN, count=spawn_count, offset=spawns_start)
+    game_map.spawns = [(x, y, SPAWN_KINDS[kind]) for x, y, kind in spawns.tolist()]
+
+    if metadata_size:
+        game_map.metadata = json.loads(mapped[metadata_start:metadata_start + metadata_size].decode('utf-8'))
+        player_start = game_map.metadata.pop('player_start', None)
+        game_map.player_start = tuple(player_start) if player_start else None
+    return game_map
+
+def save_binary(game_map: GameMap, filepath: str, chunked: bool = False) -> None:
+    """Write a map as a binary level, a strip of CHUNK_SIZE rows at a time so chunked maps never load whole.
+
+    Args:
+        game_map: Map to write, a GameMap or ChunkedMap
+        filepath: Path to write to
+        chunked: Whether to store the tiles in chunks
+    """
+    spawns = np.array([(x, y, SPAWN_KINDS.index(kind)) for x, y, kind in game_map.spawns], dtype=BINARY_SPAWN)
+    metadata = dict(game_map.metadata)
+    if game_map.player_start is not None:
+        metadata['player_start'] = list(game_map.player_start)
+    metadata_bytes = json.dumps(metadata).encode('utf-8') if metadata else b''
+
+    with open(filepath, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, BINARY_CHUNKED if chunked else 0,
+                                   game_map.width, game_map.height, len(spawns), len(metadata_bytes)))
+        for top in range(0, game_map.height, CHUNK_SIZE):
+            strip = game_map.region(0, top, game_map.width, min(game_map.height, top + CHUNK_SIZE))
+            if chunked:
+                padded = np.full((CHUNK_SIZE, -(-game_map.width // CHUNK_SIZE) * CHUNK_SIZE),
+                                 PosColor.LIGHTWALL.value, dtype=np.uint8)
+                padded[:strip.shape[0], :strip.shape[1]] = strip
+                strip = padded.reshape(CHUNK_SIZE, -1, CHUNK_SIZE).swapaxes(0, 1)
+            f.write(np.ascontiguousarray(strip).tobytes())
+        f.write(spawns.tobytes())
+        f.write(metadata_bytes)
+
+def convert(output_path: str, input_path: str = None, chunked: bool = False) -> None:
+    """Convert a level file, or the built-in constants.MAP, to the binary format.
+
+    Args:
+        output_path: Path of the .pdl file to write
+        input_path: Level to convert, None converts constants.MAP
+        chunked: Whether to store the tiles in chunks
+    """
+    if input_path is None:
+        game_map = GameMap.from_rows(constants.MAP)
+        game_map.player_start = (1.5, 1.5)
+    else:
+        game_map = load_level(input_path)
+    save_binary(game_map, output_path, chunked)
+
+def generate_level(width: int, height: int, wall_density: float = 0.2, enemies: int = 0, seed: int = 0) -> GameMap:
+    """Generate a random walled level for stress testing.
+
+    Args:
+        width: Number of columns
+        height: Number of rows
+        wall_density: Chance of each inner tile being a wall
+        enemies: Number of Imp spawns to place on empty tiles
+        seed: Random seed, the same seed always gives the same level
+
+    Returns:
+        The generated map, with the player starting at (1.5, 1.5)
+    """
+    rng = np.random.default_rng(seed)
+    tiles = np.where(rng.random((height, width)) < wall_density,
+                     np.where(rng.random((height, width)) < 0.5, PosColor.LIGHTWALL.value, PosColor.DARKWALL.value),
+                     PosColor.EMPTY.value).astype(np.uint8)
+    tiles[0, :] = tiles[-1, :] = PosColor.LIGHTWALL.value
+    tiles[:, 0] = tiles[:, -1] = PosColor.LIGHTWALL.value
+    tiles[1, 1] = PosColor.EMPTY.value
+
+    game_map = GameMap(width, height, bytearray(tiles.tobytes()))
+    game_map.player_start = (1.5, 1.5)
+
+    empty_y, empty_x = np.nonzero(tiles == PosColor.EMPTY.value)
+    picker = random.Random(seed)
+    for i in picker.sample(range(len(empty_x)), min(enemies, len(empty_x))):
+        game_map.spawns.append((int(empty_x[i]), int(empty_y[i]), 'imp'))
+    return game_map
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--chunked']
+    if len(args) in (2, 3) and args[0] == 'convert':
+        convert(args[-1], args[1] if len(args) == 3 else None, '--chunked' in sys.argv)
+    else:
+        print('usage: python levels.py convert [--chunked] [input] output.pdl')
@@ -0,0 +1,109 @@
+"""
+Path caching for PyDoom. Remembers recent paths so repeated searches between the same cells on an unchanged map
+cost a dictionary lookup, and lets enemies keep walking a planned path instead of searching again every time.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import game_map
+
+Cell = Tuple[int, int]
+
+class Route:
+    """A path an enemy is walking, and what it was planned for."""
+
+    def __init__(self, path: List[Cell], goal: Cell, version: int):
+        """Create a route.
+
+        Args:
+            path: Cells to walk, starting with the enemy's cell. May be shared with other routes, so never changed
+            goal: Cell the path was planned towards
+            version: Map version the path was planned on
+        """
+        self.path = path
+        self.goal = goal
+        self.version = version
+        self.step = 0
+
+    def next_cell(self, pos: Cell) -> Optional[Cell]:
+        """Get the cell after pos on the path, catching up if the enemy has stepped along it since last asked.
+
+        Args:
+            pos: Cell the enemy is in
+
+        Returns:
+            The next cell, or None if pos is off the path or at its end
+        """
+        if self.step + 1 < len(self.path) and self.path[self.step + 1] == pos:
+            self.step += 1
+        if self.path[self.step] != pos or self.step + 1 >= len(self.path):
+            return None
+        return self.path[self.step + 1]
+
+class PathCache:
+    """LRU cache in front of a path search, keyed by (start cell, goal cell, map version).
+
+    Paths found on an older version of the map are never returned, and age
+    out of the cache like any other entry. The cache is emptied when the
+    current map is replaced.
+    """
+
+    def __init__(self, find_path: Callable, max_size: int = 256):
+        """Create a cache.
+
+        Args:
+            find_path: Search taking (from_pos, to) and returning a list of cells or None, like astar.find_path
+            max_size: Most paths kept
+        """
+        self.find_path_uncached = find_path
+        self.max_size = max_size
+        self.paths: OrderedDict = OrderedDict()
+        self.world = None
+        self.hits = 0
+        self.misses = 0
+
+    def find_path(self, from_pos, to) -> Optional[List[Cell]]:
+        """Find a path, searching only if the same cells haven't been searched on this version of the map.
+
+        Args:
+            from_pos: Position to start from
+            to: Position to reach
+
+        Returns:
+            The search's path, shared between callers so it must not be modified, or None if there's no path
+        """
+        world = game_map.current_map()
+        if world is not self.world:
+            self.paths.clear()
+            self.world = world
+
+        key = ((int(from_pos[0]), int(from_pos[1])), (int(to[0]), int(to[1])), world.version)
+        if key in self.paths:
+            self.paths.move_to_end(key)
+            self.hits += 1
+            return self.paths[key]
+
+        path = self.find_path_uncached(from_pos, to)
+        self.misses += 1
+        self.paths[key] = path
+        if len(self.paths) > self.max_size:
+            self.paths.popitem(last=False)
+        return path
+
+    def clear(self) -> None:
+        """Forget every cached path."""
+        self.paths.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Get how often searches were answered from the cache.
+
+        Returns:
+            Dictionary with the number of cached paths, hits, misses and the hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.paths),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,134 @@
+"""
+Enemy pathfinding for PyDoom. Steers enemies towards a goal cell with A*, a shared flow field or HPA*, and keeps each
+enemy's planned route until it goes stale.
+"""
+
+from typing import List, Optional, Tuple
+import astar
+import flowfield
+import game_map
+import hpa
+import pathcache
+
+FALLBACK_RANGE = 2 * hpa.CLUSTER_SIZE # Furthest start from the goal the A* fallback searches for, in cells along either axis
+FALLBACK_MARGIN = hpa.CLUSTER_SIZE // 2 # Cells the A* fallback can stray outside the box around the start and goal
+
+Cell = Tuple[int, int]
+
+class EnemyPathfinding:
+    """The searches behind each pathfinding mode and the state they share between enemies.
+
+    Modes are 'astar', which searches once per enemy, 'flowfield', which
+    shares one search out from the goal, and 'hpa', which searches between
+    clusters for large maps. A* and HPA* paths come through a PathCache, so
+    enemies planning from the same cell to the same goal share one search.
+    """
+
+    def __init__(self):
+        self.flow_field = flowfield.FlowField()
+        self.path_finder = hpa.HierarchicalPathfinder()
+        self.path_caches = {'astar': pathcache.PathCache(astar.find_path), 'hpa': pathcache.PathCache(self.find_hpa_path)}
+
+    def tick(self, mode: str, clusters: int, goal: Cell) -> None:
+        """Do the background work of one simulation tick.
+
+        Args:
+            mode: Pathfinding mode
+            clusters: HPA* clusters to build this tick. Counted in clusters rather than seconds so replays switch
+                from A* to HPA* on the same tick
+            goal: Cell enemies are heading for, the clusters around it are built first
+        """
+        if mode == 'hpa':
+            self.path_finder.build(clusters, around=goal)
+
+    def plan(self, mode: str, goal: Cell) -> None:
+        """Update whatever is shared between enemies before they step towards a goal.
+
+        Args:
+            mode: Pathfinding mode
+            goal: Cell every enemy is heading for
+        """
+        if mode == 'flowfield':
+            self.flow_field.update(goal)
+
+    def next_step(self, enemy, mode: str, goal: Cell, replan_distance: int) -> Optional[Cell]:
+        """Find the next cell an enemy should move to on its way to a goal.
+
+        Args:
+            enemy: The enemy to move
+            mode: Pathfinding mode
+            goal: Cell to reach
+            replan_distance: See follow_route
+
+        Returns:
+            The next cell, or None if the enemy has no path or the goal is the next step
+        """
+        if mode == 'flowfield':
+            next_pos = self.flow_field.next_step((enemy.x, enemy.y))
+        else:
+            next_pos = self.follow_route(enemy, mode, goal, replan_distance)
+
+        # Paths end on the goal, so stop once it is the next step
+        if next_pos is None or next_pos == goal:
+            return None
+        return next_pos
+
+    def follow_route(self, enemy, mode: str, goal: Cell, replan_distance: int) -> Optional[Cell]:
+        """Get the next cell of an enemy's planned path, planning a new one only when needed.
+
+        The enemy keeps its path while it is on it, the map hasn't changed and
+        the goal is within replan_distance cells of the cell it was planned
+        towards.
+
+        Args:
+            enemy: The enemy to move
+            mode: 'astar' or 'hpa'
+            goal: Cell to reach
+            replan_distance: How far the goal can move before the path is planned again
+
+        Returns:
+            The next cell, or None if the enemy has no path
+        """
+        cell = (int(enemy.x), int(enemy.y))
+        version = game_map.current_map().version
+        route = enemy.route
+
+        if (route is not None and route.version == version
+                and max(abs(goal[0] - route.goal[0]), abs(goal[1] - route.goal[1])) <= replan_distance):
+            next_pos = route.next_cell(cell)
+            if next_pos is not None:
+                return next_pos
+
+        path = self.path_caches[mode].find_path(cell, goal)
+        if not path or len(path) < 2:
+            enemy.route = None
+            return None
+        enemy.route = pathcache.Route(path, goal, version)
+        return enemy.route.next_cell(cell)
+
+    def find_hpa_path(self, from_pos, to) -> Optional[List[Cell]]:
+        """Search with the hierarchical pathfinder once its cluster graph covers the map, and with A* until then.
+
+        Until then A* only searches for starts within FALLBACK_RANGE of the
+        goal, inside the box around both widened by FALLBACK_MARGIN, so no
+        search costs more than a few clusters' worth of cells. Routes from
+        further away or that have to leave the box are found once the graph,
+        which is built nearest the goal first, is complete.
+
+        Args:
+            from_pos: Position to start from
+            to: Position to reach
+
+        Returns:
+            List of cells to walk, or None if there's no path
+        """
+        if not self.path_finder.complete:
+            if max(abs(int(from_pos[0]) - int(to[0])), abs(int(from_pos[1]) - int(to[1]))) > FALLBACK_RANGE:
+                return None
+            world = game_map.current_map()
+            bounds = (max(0, min(int(from_pos[0]), int(to[0])) - FALLBACK_MARGIN),
+                      max(0, min(int(from_pos[1]), int(to[1])) - FALLBACK_MARGIN),
+                      min(world.width, max(int(from_pos[0]), int(to[0])) + FALLBACK_MARGIN + 1),
+                      min(world.height, max(int(from_pos[1]), int(to[1])) + FALLBACK_MARGIN + 1))
+            return astar.find_path(from_pos, to, bounds)
+        return self.path_finder.find_path(from_pos, to)
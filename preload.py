@@ -0,0 +1,102 @@
+"""
+Background asset loading for PyDoom. Reads, probes and decodes asset files on a thread pool so a slow disk doesn't
+hold up the first frame, and reports progress as each asset finishes.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import queue
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+def read_file(filepath: str) -> int:
+    """Read a whole file and throw the contents away, so opening it again is served from the OS cache.
+
+    Args:
+        filepath: Path to the file
+
+    Returns:
+        Size of the file in bytes
+    """
+    with open(filepath, 'rb') as f:
+        return len(f.read())
+
+class AssetLoader:
+    """Runs asset loading functions on worker threads and hands their results back on the main thread.
+
+    Assets are started in the order they are submitted, so critical assets
+    should be submitted first. Work that has to happen on the main thread,
+    like creating cmu_graphics shapes, is done by the caller for each asset
+    returned from finished().
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """Create a loader.
+
+        Args:
+            max_workers: Number of files read at the same time
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preload')
+        self.futures: Dict[Hashable, Future] = {}
+        self.critical: Set[Hashable] = set()
+        self.completed = queue.SimpleQueue()
+        self.collected = 0
+
+    def submit(self, name: Hashable, load: Callable[[], Any], critical: bool = False) -> None:
+        """Start loading an asset.
+
+        Args:
+            name: Key the asset is reported under
+            load: Function run on a worker thread, its return value is the asset's result
+            critical: Whether gameplay has to wait for this asset
+        """
+        future = self.executor.submit(load)
+        self.futures[name] = future
+        if critical:
+            self.critical.add(name)
+        future.add_done_callback(lambda _: self.completed.put(name))
+
+    @property
+    def total(self) -> int:
+        """Number of assets submitted."""
+        return len(self.futures)
+
+    @property
+    def loaded(self) -> int:
+        """Number of assets that have finished loading."""
+        return sum(future.done() for future in self.futures.values())
+
+    def progress(self) -> float:
+        """Get the fraction of submitted assets that have finished loading, from 0 to 1."""
+        return self.loaded / self.total if self.futures else 1.0
+
+    def critical_ready(self) -> bool:
+        """Check whether every critical asset has finished loading."""
+        return all(self.futures[name].done() for name in self.critical)
+
+    def done(self) -> bool:
+        """Check whether every asset has finished loading and been returned from finished()."""
+        return self.collected == len(self.futures)
+
+    def finished(self) -> List[Tuple[Hashable, Any, Optional[BaseException]]]:
+        """Get the assets that finished since the last call. Must be called from the main thread.
+
+        An asset that fails doesn't stop the others being returned, the
+        caller decides which failures it can carry on without.
+
+        Returns:
+            List of (name, result, error) in the order the assets finished, error is what the load function
+            raised, or None with result set if it succeeded
+        """
+        results = []
+        while True:
+            try:
+                name = self.completed.get_nowait()
+            except queue.Empty:
+                return results
+            self.collected += 1
+            future = self.futures[name]
+            error = future.exception()
+            results.append((name, None if error is not None else future.result(), error))
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once the submitted assets have finished."""
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,148 @@
+"""
+Frame-time profiler for PyDoom. Records how long each phase of a frame takes into a ring buffer of recent frames.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import json
+import math
+import time
+from typing import Dict, List, Optional
+
+# Phases in the order they are reported
+PHASES = ('raycast', 'shapes', 'sprites', 'pathfinding', 'animation')
+PERCENTILES = (50, 95, 99)
+
+class FrameRecord:
+    """Timings of one frame. Phase spans are (name, start, duration) in seconds on the profiler clock."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.duration = 0.0
+        self.phases = []
+
+class Profiler:
+    """Collects per-phase timings for the most recent frames."""
+
+    def __init__(self, capacity: int = 900, clock=time.perf_counter):
+        """Create a profiler.
+
+        Args:
+            capacity: Number of recent frames to keep
+            clock: Function returning the current time in seconds
+        """
+        self.clock = clock
+        self.frames = deque(maxlen=capacity)
+        self.origin = clock()
+        self._current = None
+
+    def begin_frame(self) -> None:
+        """Start timing a new frame."""
+        self._current = FrameRecord(self.clock() - self.origin)
+
+    def end_frame(self) -> None:
+        """Finish the current frame and add it to the ring buffer."""
+        if self._current is None:
+            return
+        self._current.duration = self.clock() - self.origin - self._current.start
+        self.frames.append(self._current)
+        self._current = None
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        """Add a phase span to the current frame.
+
+        Args:
+            name: Phase name
+            start: Start time in seconds on the profiler clock
+            duration: Length of the phase in seconds
+        """
+        if self._current is not None:
+            self._current.phases.append((name, start, duration))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the body of a with block as one phase of the current frame.
+
+        Args:
+            name: Phase name
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            end = self.clock()
+            self.record(name, start - self.origin, end - start)
+
+    def frame_times(self) -> List[float]:
+        """Get the duration of every recorded frame in seconds, oldest first."""
+        return [frame.duration for frame in self.frames]
+
+    def phase_times(self, name: str) -> List[float]:
+        """Get the total time spent in a phase in every recorded frame, in seconds."""
+        return [sum(duration for phase, _, duration in frame.phases if phase == name) for frame in self.frames]
+
+    def percentiles(self, name: Optional[str] = None) -> Dict[str, float]:
+        """Get the p50, p95 and p99 of frame times, or of one phase's times, in milliseconds.
+
+        Args:
+            name: Phase name, or None for whole frames
+
+        Returns:
+            Dictionary like {'p50': ..., 'p95': ..., 'p99': ...}, empty if nothing was recorded
+        """
+        times = sorted(self.frame_times() if name is None else self.phase_times(name))
+        if not times:
+            return {}
+        return {f'p{p}': times[min(len(times) - 1, max(0, math.ceil(p / 100 * len(times)) - 1))] * 1000 for p in PERCENTILES}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get percentiles and mean times in milliseconds for whole frames and for each phase that was recorded."""
+        recorded = {name for frame in self.frames for name, _, _ in frame.phases}
+        names = [phase for phase in PHASES if phase in recorded] + sorted(recorded - set(PHASES))
+
+        stats = {}
+        for name in [None] + names:
+            times = self.frame_times() if name is None else self.phase_times(name)
+            if not times:
+                continue
+            stats['frame' if name is None else name] = {
+                **self.percentiles(name),
+                'mean': sum(times) / len(times) * 1000,
+                'count': len(times),
+            }
+        return stats
+
+    def export_json(self, filepath: str) -> None:
+        """Write the stats and every recorded frame's timings to a JSON file.
+
+        Args:
+            filepath: Path to write to
+        """
+        data = {
+            'stats': self.stats(),
+            'frames': [
+                {
+                    'start': frame.start,
+                    'duration': frame.duration,
+                    'phases': [{'name': name, 'start': start, 'duration': duration} for name, start, duration in frame.phases],
+                }
+                for frame in self.frames
+            ],
+        }
+        with open(filepath, 'w') as f:
+            json.dump(data, f, indent=1)
+
+    def export_chrome_trace(self, filepath: str) -> None:
+        """Write the recorded frames as a Chrome trace, viewable in chrome://tracing or Perfetto.
+
+        Args:
+            filepath: Path to write to
+        """
+        events = []
+        for frame in self.frames:
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': frame.start * 1e6, 'dur': frame.duration * 1e6})
+            for name, start, duration in frame.phases:
+                events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': start * 1e6, 'dur': duration * 1e6})
+        with open(filepath, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,107 @@
+"""
+Adaptive quality for PyDoom. Watches recent frame times and moves between quality levels to hold a target frame time.
+"""
+
+from collections import deque
+from typing import Dict, Optional, Sequence, Tuple
+
+# (column width in pixels, most sprites drawn per frame) from best to cheapest
+QUALITY_LEVELS = ((1, 64), (2, 48), (3, 32), (4, 24), (6, 16), (8, 8))
+
+class QualityController:
+    """Picks a quality level from measured frame times, with hysteresis so it doesn't flap between levels.
+
+    Quality drops a level when the average of a full window of frames is
+    over the target, and only rises again when a window averages well under
+    it. After every change the window is cleared, so each decision is made on
+    frames rendered at the current level, and rising waits a longer cooldown
+    than dropping. Every time a level proves too slow, the wait before
+    returning to it doubles.
+    """
+
+    def __init__(self, target_frame_time: float, levels: Sequence[Tuple[int, int]] = QUALITY_LEVELS,
+                 start_resolution: Optional[int] = None, window: int = 30,
+                 downgrade_threshold: float = 1.0, upgrade_threshold: float = 0.6, upgrade_cooldown: int = 90):
+        """Create a controller.
+
+        Args:
+            target_frame_time: Frame time to hold in seconds
+            levels: (column width, sprite cap) pairs from best to cheapest
+            start_resolution: Column width to start at, the closest level is used. None starts at the best level
+            window: Number of frames averaged for each decision
+            downgrade_threshold: Drop quality when the average is over target_frame_time times this
+            upgrade_threshold: Raise quality when the average is under target_frame_time times this
+            upgrade_cooldown: Frames to wait after any change before quality can rise to a level that hasn't been
+                too slow yet
+        """
+        self.target_frame_time = target_frame_time
+        self.levels = tuple(levels)
+        self.window = window
+        self.downgrade_threshold = downgrade_threshold
+        self.upgrade_threshold = upgrade_threshold
+        self.upgrade_cooldown = upgrade_cooldown
+
+        self.level = 0
+        if start_resolution is not None:
+            self.level = min(range(len(self.levels)), key=lambda i: abs(self.levels[i][0] - start_resolution))
+        self.frame_times = deque(maxlen=window)
+        self.frames_since_change = 0
+        self.changes = 0
+        self.failures = [0] * len(self.levels)
+
+    @property
+    def resolution(self) -> int:
+        """Column width of the current level."""
+        return self.levels[self.level][0]
+
+    @property
+    def sprite_cap(self) -> int:
+        """Most sprites to draw per frame at the current level."""
+        return self.levels[self.level][1]
+
+    def record(self, frame_time: float) -> bool:
+        """Add a measured frame time and change level if needed.
+
+        Args:
+            frame_time: Time the frame took in seconds
+
+        Returns:
+            True if the level changed
+        """
+        self.frame_times.append(frame_time)
+        self.frames_since_change += 1
+        if len(self.frame_times) < self.window:
+            return False
+
+        average = sum(self.frame_times) / len(self.frame_times)
+        if average > self.target_frame_time * self.downgrade_threshold and self.level < len(self.levels) - 1:
+            self.failures[self.level] += 1
+            return self._change(self.level + 1)
+        if (average < self.target_frame_time * self.upgrade_threshold and self.level > 0
+                and self.frames_since_change >= self.upgrade_cooldown * 2 ** min(self.failures[self.level - 1], 6)):
+            return self._change(self.level - 1)
+        return False
+
+    def _change(self, level: int) -> bool:
+        self.level = level
+        self.frame_times.clear()
+        self.frames_since_change = 0
+        self.changes += 1
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Get the current level and the frame times it was chosen from.
+
+        Returns:
+            Dictionary with the level, its column width and sprite cap, the target and recent average frame times
+            in milliseconds, and how many times the level has changed
+        """
+        average = sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0.0
+        return {
+            'level': self.level,
+            'resolution': self.resolution,
+            'sprite_cap': self.sprite_cap,
+            'target_ms': self.target_frame_time * 1000,
+            'average_ms': average * 1000,
+            'changes': self.changes,
+        }
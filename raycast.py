@@ -0,0 +1,204 @@
+"""
+Batched ray casting for PyDoom. Walks every screen column's ray through the map at once using NumPy,
+or a single ray cell by cell.
+"""
+
+import math
+from typing import Iterator, Tuple
+import numpy as np
+import constants
+
+def cast_rays(origin_x: float, origin_y: float, angles, grid: np.ndarray,
+              default_distance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cast one ray per angle from the same origin using DDA.
+
+    Produces the same results as casting each ray on its own: the first non-empty
+    tile along each ray is the hit, and rays that leave the map or travel
+    further than default_distance without hitting anything report
+    default_distance and a light wall. Because no ray looks past
+    default_distance, any grid covering that far around the origin, like a
+    GameMap.window, gives the same results as the whole map.
+
+    Args:
+        origin_x: X coordinate of the ray origin
+        origin_y: Y coordinate of the ray origin
+        angles: Sequence or array of ray angles
+        grid: Map tiles indexed as grid[y, x], usually from GameMap.window
+        default_distance: Furthest a ray looks, and the distance reported for rays that hit nothing
+
+    Returns:
+        Tuple of (perpendicular distances, wall type values, hit sides) arrays.
+        Sides are 0 for NS walls and 1 for EW walls.
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    return cast_ray_directions(origin_x, origin_y, np.cos(angles), np.sin(angles), grid, default_distance)
+
+class Rays:
+    """DDA state of rays cast from one point, each stepped across one grid line at a time.
+
+    cast_ray_directions steps every unfinished ray together, cast_ray and
+    walk_cells step a single one, and all of them go through step so they
+    see exactly the same cells.
+    """
+
+    def __init__(self, origin_x: float, origin_y: float, ray_dir_x: np.ndarray, ray_dir_y: np.ndarray):
+        """Start rays in the origin's cell.
+
+        Args:
+            origin_x: X coordinate of the ray origin
+            origin_y: Y coordinate of the ray origin
+            ray_dir_x: X component of each ray's unit direction
+            ray_dir_y: Y component of each ray's unit direction
+        """
+        count = ray_dir_x.shape[0]
+        start_x = int(origin_x)
+        start_y = int(origin_y)
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.ray_dir_x = ray_dir_x
+        self.ray_dir_y = ray_dir_y
+        self.map_x = np.full(count, start_x, dtype=np.int64)
+        self.map_y = np.full(count, start_y, dtype=np.int64)
+
+        self.delta_dist_x = np.abs(1 / (ray_dir_x + 0.0001))
+        self.delta_dist_y = np.abs(1 / (ray_dir_y + 0.0001))
+        self.step_x = np.where(ray_dir_x < 0, -1, 1)
+        self.step_y = np.where(ray_dir_y < 0, -1, 1)
+        self.side_dist_x = np.where(ray_dir_x < 0, (origin_x - start_x) * self.delta_dist_x,
+                                    (start_x + 1.0 - origin_x) * self.delta_dist_x)
+        self.side_dist_y = np.where(ray_dir_y < 0, (origin_y - start_y) * self.delta_dist_y,
+                                    (start_y + 1.0 - origin_y) * self.delta_dist_y)
+
+        # 0 where a ray last crossed a NS wall, 1 for an EW wall
+        self.side = np.zeros(count, dtype=np.int8)
+
+    def step(self, rays: np.ndarray) -> None:
+        """Move rays into the next cell along them.
+
+        Args:
+            rays: Indices of the rays to step
+        """
+        step_along_x = self.side_dist_x[rays] < self.side_dist_y[rays]
+        along_x = rays[step_along_x]
+        along_y = rays[~step_along_x]
+
+        self.side_dist_x[along_x] += self.delta_dist_x[along_x]
+        self.map_x[along_x] += self.step_x[along_x]
+        self.side[along_x] = 0
+
+        self.side_dist_y[along_y] += self.delta_dist_y[along_y]
+        self.map_y[along_y] += self.step_y[along_y]
+        self.side[along_y] = 1
+
+    def distances(self) -> np.ndarray:
+        """Get how far along each ray the wall it last crossed is."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist_x = (self.map_x - self.origin_x + (1 - self.step_x) / 2) / self.ray_dir_x
+            dist_y = (self.map_y - self.origin_y + (1 - self.step_y) / 2) / self.ray_dir_y
+        return np.where(self.side == 0, dist_x, dist_y)
+
+def cast_ray_directions(origin_x: float, origin_y: float, ray_dir_x: np.ndarray, ray_dir_y: np.ndarray,
+                        grid: np.ndarray, default_distance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cast one ray per unit direction vector from the same origin using DDA.
+
+    Same as cast_rays, for callers that already have each ray's direction.
+
+    Args:
+        origin_x: X coordinate of the ray origin
+        origin_y: Y coordinate of the ray origin
+        ray_dir_x: X component of each ray's unit direction
+        ray_dir_y: Y component of each ray's unit direction
+        grid: Map tiles indexed as grid[y, x], usually from GameMap.window
+        default_distance: Furthest a ray looks, and the distance reported for rays that hit nothing
+
+    Returns:
+        Tuple of (distances along the rays, wall type values, hit sides) arrays.
+        Sides are 0 for NS walls and 1 for EW walls.
+    """
+    count = ray_dir_x.shape[0]
+    rows, columns = grid.shape
+    rays = Rays(origin_x, origin_y, ray_dir_x, ray_dir_y)
+
+    hit = np.zeros(count, dtype=bool)
+    wall_type = np.full(count, constants.PosColor.LIGHTWALL.value, dtype=np.uint8)
+
+    inside = 0 <= int(origin_x) < columns and 0 <= int(origin_y) < rows
+    active = np.flatnonzero(np.full(count, inside))
+
+    # Step every unfinished ray one cell per iteration until it hits a wall, leaves the map or goes out of range
+    while active.size:
+        active = active[np.minimum(rays.side_dist_x[active], rays.side_dist_y[active]) <= default_distance]
+        rays.step(active)
+
+        ray_x = rays.map_x[active]
+        ray_y = rays.map_y[active]
+        in_map = (ray_x >= 0) & (ray_x < columns) & (ray_y >= 0) & (ray_y < rows)
+        active = active[in_map]
+
+        tiles = grid[ray_y[in_map], ray_x[in_map]]
+        is_wall = tiles != constants.PosColor.EMPTY.value
+        hit[active[is_wall]] = True
+        wall_type[active[is_wall]] = tiles[is_wall]
+        active = active[~is_wall]
+
+    distances = rays.distances()
+    hit &= distances <= default_distance
+    distances = np.where(hit, distances, default_distance)
+    wall_type[~hit] = constants.PosColor.LIGHTWALL.value
+    return distances, wall_type, rays.side
+
+def cast_ray(origin_x: float, origin_y: float, angle: float, grid: np.ndarray,
+             default_distance: float) -> Tuple[float, int]:
+    """Cast a single ray on its own, stepping it until it hits a wall, leaves the map or goes out of range.
+
+    Gives the same result as the same ray in cast_rays.
+
+    Args:
+        origin_x: X coordinate of the ray origin
+        origin_y: Y coordinate of the ray origin
+        angle: Angle of the ray
+        grid: Map tiles indexed as grid[y, x], usually from GameMap.window
+        default_distance: Furthest the ray looks, and the distance reported if it hits nothing
+
+    Returns:
+        Tuple of (distance along the ray, wall type value)
+    """
+    rows, columns = grid.shape
+    rays = Rays(origin_x, origin_y, np.array([math.cos(angle)]), np.array([math.sin(angle)]))
+    only = np.zeros(1, dtype=np.intp)
+    miss = (default_distance, constants.PosColor.LIGHTWALL.value)
+    if not (0 <= int(origin_x) < columns and 0 <= int(origin_y) < rows):
+        return miss
+
+    while min(rays.side_dist_x[0], rays.side_dist_y[0]) <= default_distance:
+        rays.step(only)
+        map_x, map_y = int(rays.map_x[0]), int(rays.map_y[0])
+        if not (0 <= map_x < columns and 0 <= map_y < rows):
+            return miss
+        tile = int(grid[map_y, map_x])
+        if tile != constants.PosColor.EMPTY.value:
+            distance = float(rays.distances()[0])
+            return (distance, tile) if distance <= default_distance else miss
+    return miss
+
+def walk_cells(origin_x: float, origin_y: float, angle: float, max_distance: float) -> Iterator[Tuple[int, int, float]]:
+    """Walk the map cells one ray passes through, in order, using the same DDA stepping as cast_rays.
+
+    Args:
+        origin_x: X coordinate of the ray origin
+        origin_y: Y coordinate of the ray origin
+        angle: Angle of the ray
+        max_distance: Stop once the ray has travelled this far
+
+    Yields:
+        Tuple of (cell x, cell y, distance along the ray where it enters the cell), starting with the origin's cell
+    """
+    rays = Rays(origin_x, origin_y, np.array([math.cos(angle)]), np.array([math.sin(angle)]))
+    only = np.zeros(1, dtype=np.intp)
+
+    distance = 0.0
+    while distance <= max_distance:
+        yield int(rays.map_x[0]), int(rays.map_y[0]), distance
+        # The ray crosses whichever grid line is nearer next, which is the one step takes it over
+        distance = float(min(rays.side_dist_x[0], rays.side_dist_y[0]))
+        rays.step(only)
@@ -0,0 +1,80 @@
+"""
+Input recording and playback for PyDoom. A recording is the set of keys held on every game step, so playing it back
+from the same level and starting position reproduces the whole session.
+"""
+
+import json
+from typing import Iterator, List, Optional, Set, Tuple
+
+RECORDING_VERSION = 1
+
+class Recording:
+    """Keys held on each step of a session, and where the session started."""
+
+    def __init__(self, level: Optional[str] = None, start: Tuple[float, float, float] = (1.5, 1.5, 0.0)):
+        """Create an empty recording.
+
+        Args:
+            level: Level file the session was played on, or None for the built-in map
+            start: Player (x, y, angle) at the first step
+        """
+        self.level = level
+        self.start = tuple(start)
+        self.steps: List[frozenset] = []
+
+    def record(self, keys) -> None:
+        """Add the keys held on the next step.
+
+        Args:
+            keys: Keys held during the step, empty if none were
+        """
+        self.steps.append(frozenset(keys))
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __iter__(self) -> Iterator[Set[str]]:
+        for keys in self.steps:
+            yield set(keys)
+
+    def save(self, filepath: str) -> None:
+        """Write the recording to a JSON file, storing runs of identical steps once.
+
+        Args:
+            filepath: Path to write to
+        """
+        runs = []
+        for keys in self.steps:
+            if runs and runs[-1][1] == keys:
+                runs[-1][0] += 1
+            else:
+                runs.append([1, keys])
+
+        data = {
+            'version': RECORDING_VERSION,
+            'level': self.level,
+            'start': list(self.start),
+            'steps': [[count, sorted(keys)] for count, keys in runs],
+        }
+        with open(filepath, 'w') as f:
+            json.dump(data, f)
+
+def load_recording(filepath: str) -> Recording:
+    """Read a recording written by Recording.save.
+
+    Args:
+        filepath: Path to the JSON file
+
+    Returns:
+        The recording
+    """
+    with open(filepath) as f:
+        data = json.load(f)
+
+    if data.get('version') != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version {data.get('version')}")
+
+    recording = Recording(data['level'], data['start'])
+    for count, keys in data['steps']:
+        recording.steps.extend([frozenset(keys)] * count)
+    return recording
@@ -0,0 +1,145 @@
+"""
+Retained-mode cmu_graphics scene for PyDoom. Shapes are created once and only have their coordinates, fill and visibility updated.
+"""
+
+from typing import List, Sequence, Tuple
+from cmu_graphics import Group, Rect
+
+class Scene:
+    """A pool of wall column shapes with a layer for each sprite in front of them.
+
+    Every sprite layer holds the sprite's image and rects that redraw the wall
+    columns nearer than the sprite on top of it. Layers are drawn far to near,
+    so each sprite is clipped per column against the wall depth buffer and
+    against nearer sprites.
+    """
+
+    def __init__(self, parent: Group, width: int, height: int, column_width: int, floor_color: str):
+        """Create the floor and wall shapes.
+
+        Args:
+            parent: Group to add the scene to
+            width: Screen width
+            height: Screen height
+            column_width: Width of each wall column in pixels
+            floor_color: Fill color of the floor
+        """
+        self.parent = parent
+        self.column_width = column_width
+
+        self.background_group = Group()
+        self.sprite_group = Group()
+        parent.add(self.background_group)
+        parent.add(self.sprite_group)
+
+        # Walls always reach down past the horizon, so one floor rect behind them covers every column
+        self.background_group.add(Rect(0, height // 2, width, height - height // 2, fill=floor_color))
+
+        self.walls = []
+        for left in range(0, width, column_width):
+            wall = Rect(left, 0, column_width, 1, visible=False)
+            self.background_group.add(wall)
+            self.walls.append(wall)
+
+        count = len(self.walls)
+        self.tops = [None] * count
+        self.heights = [None] * count
+        self.colors = [None] * count
+        self.depths = [0.0] * count
+        self.layers = []
+
+    def update_walls(self, tops: Sequence[int], bottoms: Sequence[int], colors: Sequence[str], depths: Sequence[float]) -> None:
+        """Move the wall columns to a new view, touching only the shapes that changed.
+
+        Args:
+            tops: Top of each column
+            bottoms: Bottom of each column
+            colors: Fill color of each column
+            depths: Fisheye corrected distance to the wall in each column
+        """
+        for i, (top, bottom, color) in enumerate(zip(tops, bottoms, colors)):
+            height = bottom - top
+            if height != self.heights[i] or top != self.tops[i]:
+                wall = self.walls[i]
+                if height > 0:
+                    wall.top = top
+                    wall.height = height
+                wall.visible = height > 0
+                self.tops[i] = top
+                self.heights[i] = height
+            if color != self.colors[i]:
+                self.walls[i].fill = color
+                self.colors[i] = color
+        self.depths = list(depths)
+        for layer in self.layers:
+            layer.occluded = None
+
+    def update_sprites(self, sprites: Sequence[Tuple[object, float, float, float]]) -> None:
+        """Draw sprite images far to near, each clipped against the walls in front of it.
+
+        Args:
+            sprites: (image, distance, left, right) of every sprite to draw, sorted far to near,
+                where left and right are the image's screen x range
+        """
+        while len(self.layers) < len(sprites):
+            layer = SpriteLayer()
+            self.sprite_group.add(layer.group)
+            self.layers.append(layer)
+
+        last_column = len(self.walls) - 1
+        for layer, (image, distance, left, right) in zip(self.layers, sprites):
+            layer.show(image)
+            first = max(0, int(left // self.column_width))
+            last = min(last_column, int(right // self.column_width))
+            occluded = [i for i in range(first, last + 1) if self.depths[i] <= distance and self.heights[i] > 0]
+            layer.occlude(occluded, self)
+
+        for layer in self.layers[len(sprites):]:
+            layer.occlude([], self)
+
+    def remove(self) -> None:
+        """Take the scene's shapes off the screen."""
+        self.parent.remove(self.background_group)
+        self.parent.remove(self.sprite_group)
+
+class SpriteLayer:
+    """One sprite image and the wall column rects drawn over it."""
+
+    def __init__(self):
+        self.group = Group()
+        self.occluders = []
+        self.occluded = []
+
+    def show(self, image) -> None:
+        """Put an image at the back of this layer."""
+        # Images move between layers as sprites change order, so check where the image is rather than what was shown last
+        if image.group is not self.group:
+            self.group.add(image)
+            image.toBack()
+
+    def occlude(self, columns: List[int], scene: Scene) -> None:
+        """Cover the given wall columns of the scene over this layer's image.
+
+        Args:
+            columns: Indices of the columns nearer than the sprite
+            scene: Scene holding the wall columns
+        """
+        if columns == self.occluded:
+            return
+        self.occluded = columns
+
+        while len(self.occluders) < len(columns):
+            rect = Rect(0, 0, scene.column_width, 1, visible=False)
+            self.group.add(rect)
+            self.occluders.append(rect)
+
+        for rect, i in zip(self.occluders, columns):
+            rect.left = i * scene.column_width
+            rect.top = scene.tops[i]
+            rect.height = scene.heights[i]
+            rect.fill = scene.colors[i]
+            rect.visible = True
+        for rect in self.occluders[len(columns):]:
+            if not rect.visible:
+                break
+            rect.visible = False
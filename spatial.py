@@ -0,0 +1,96 @@
+"""
+Spatial index for PyDoom enemies. Buckets enemies by the map cell they stand in so queries only look at nearby cells.
+"""
+
+import math
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+class SpatialHash:
+    """Uniform grid of buckets keyed by map cell.
+
+    Enemies in the index keep a reference to it in their index attribute and
+    call update() on it whenever they move, so the buckets always match
+    their positions.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[int, int], List[object]] = {}
+        self.cells: Dict[int, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __iter__(self) -> Iterator[object]:
+        for bucket in self.buckets.values():
+            yield from bucket
+
+    def insert(self, enemy) -> None:
+        """Add an enemy to the bucket of the cell it stands in."""
+        cell = (int(enemy.x), int(enemy.y))
+        self.buckets.setdefault(cell, []).append(enemy)
+        self.cells[id(enemy)] = cell
+        enemy.index = self
+
+    def remove(self, enemy) -> None:
+        """Take an enemy out of the index."""
+        cell = self.cells.pop(id(enemy))
+        bucket = self.buckets[cell]
+        bucket.remove(enemy)
+        if not bucket:
+            del self.buckets[cell]
+        enemy.index = None
+
+    def update(self, enemy) -> None:
+        """Move an enemy to the bucket of its current cell if it changed cells."""
+        cell = (int(enemy.x), int(enemy.y))
+        if self.cells[id(enemy)] != cell:
+            self.remove(enemy)
+            self.insert(enemy)
+
+    def clear(self) -> None:
+        """Take every enemy out of the index."""
+        for enemy in list(self):
+            enemy.index = None
+        self.buckets.clear()
+        self.cells.clear()
+
+    def in_cells(self, cells: Iterable[Tuple[int, int]]) -> List[object]:
+        """Get the enemies standing in any of the given cells.
+
+        Args:
+            cells: (x, y) map cells to look in
+
+        Returns:
+            List of enemies, in the order the cells were given
+        """
+        found = []
+        for cell in cells:
+            found.extend(self.buckets.get(cell, ()))
+        return found
+
+    def within_radius(self, x: float, y: float, radius: float) -> List[object]:
+        """Get the enemies whose position is within a radius of a point.
+
+        Args:
+            x: X coordinate of the centre
+            y: Y coordinate of the centre
+            radius: Distance from the centre
+
+        Returns:
+            List of enemies in no particular order
+        """
+        min_x, max_x = math.floor(x - radius), math.floor(x + radius)
+        min_y, max_y = math.floor(y - radius), math.floor(y + radius)
+
+        # Look up every cell in the bounding box, or every occupied cell if there are fewer of those
+        if (max_x - min_x + 1) * (max_y - min_y + 1) <= len(self.buckets):
+            cells = ((cell_x, cell_y) for cell_y in range(min_y, max_y + 1) for cell_x in range(min_x, max_x + 1))
+            buckets = (self.buckets[cell] for cell in cells if cell in self.buckets)
+        else:
+            buckets = (bucket for (cell_x, cell_y), bucket in self.buckets.items()
+                       if min_x <= cell_x <= max_x and min_y <= cell_y <= max_y)
+
+        radius_squared = radius * radius
+        return [enemy for bucket in buckets for enemy in bucket
+                if (enemy.x - x) ** 2 + (enemy.y - y) ** 2 <= radius_squared]
+
@@ -0,0 +1,66 @@
+"""
+Batched sprite projection for PyDoom. Projects every enemy onto the screen at once using NumPy.
+"""
+
+import math
+from typing import Optional, Tuple
+import numpy as np
+
+FOV = math.pi / 2
+
+def project_sprites(xs, ys, aspect_ratios, origin_x: float, origin_y: float, angle: float,
+                    screen_width: int, screen_height: int, max_distance: float,
+                    depths: Optional[np.ndarray] = None, column_width: int = 1, fov: float = FOV) -> Tuple[np.ndarray, ...]:
+    """Project billboard sprites onto the screen, culling the ones that can't be seen.
+
+    Uses the same projection as render_sprite in doom.py: sprites stand in the
+    middle of their cell, are placed on screen by their angle from the view
+    direction and are scaled by their fisheye corrected distance.
+
+    Args:
+        xs: Cell x coordinate of each sprite
+        ys: Cell y coordinate of each sprite
+        aspect_ratios: Width over height of each sprite's current frame
+        origin_x: X coordinate of the camera
+        origin_y: Y coordinate of the camera
+        angle: View direction of the camera
+        screen_width: Screen width in pixels
+        screen_height: Screen height in pixels
+        max_distance: Sprites farther than this are culled
+        depths: Optional fisheye corrected wall distance per screen column, sprites hidden behind walls in every
+            column they cover are culled
+        column_width: Width of each depth column in pixels
+        fov: Horizontal field of view in radians
+
+    Returns:
+        Tuple of (indices, lefts, tops, widths, heights, distances) arrays for the visible sprites, sorted far to near.
+        Indices refer to the input order.
+    """
+    dx = np.asarray(xs, dtype=np.float64) + 0.5 - origin_x
+    dy = np.asarray(ys, dtype=np.float64) + 0.5 - origin_y
+    euclidean_distances = np.hypot(dx, dy)
+    relative_angles = (np.arctan2(dy, dx) - angle + math.pi) % (2 * math.pi) - math.pi
+
+    distances = euclidean_distances * np.cos(relative_angles)
+    heights = screen_height / (distances + 0.0001)
+    widths = heights * np.asarray(aspect_ratios, dtype=np.float64)
+    lefts = screen_width * (0.5 + relative_angles / fov) - widths / 2
+    tops = screen_height / 2 - heights / 2
+
+    visible = ((euclidean_distances >= 0.1) & (euclidean_distances <= max_distance)
+               & (np.abs(relative_angles) <= math.pi / 2)
+               & (lefts + widths > 0) & (lefts < screen_width))
+
+    if depths is not None and visible.any():
+        # A sprite is only drawn if some column it covers has its wall behind the sprite
+        candidates = visible.nonzero()[0]
+        columns = np.arange(len(depths))
+        first = np.floor(lefts[candidates] / column_width)[:, None]
+        last = np.floor((lefts[candidates] + widths[candidates]) / column_width)[:, None]
+        in_span = (columns >= first) & (columns <= last)
+        uncovered = (in_span & (np.asarray(depths)[None, :] > distances[candidates, None])).any(axis=1)
+        visible[candidates[~uncovered]] = False
+
+    indices = visible.nonzero()[0]
+    indices = indices[np.argsort(-distances[indices], kind='stable')]
+    return indices, lefts[indices], tops[indices], widths[indices], heights[indices], distances[indices]
@@ -0,0 +1,8 @@
+"""
+Puts the game's flat modules on the import path so the tests can run from any directory.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
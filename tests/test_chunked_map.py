@@ -0,0 +1,47 @@
+"""
+Tests for ChunkedMap. A level has to look the same whether it is stored flat or in chunks.
+"""
+
+import math
+import random
+import numpy as np
+import camera
+import doom
+import game_map
+import levels
+import raycast
+
+def cast_view(world, x: float, y: float, angle: float, projection: camera.Camera):
+    """Cast every column's ray the way the renderers do, through the map's window."""
+    ray_dir_x, ray_dir_y = projection.ray_directions(angle)
+    grid, left, top = world.window(x, y, doom.MAX_VIEW_DISTANCE + 1)
+    return raycast.cast_ray_directions(x - left, y - top, ray_dir_x, ray_dir_y, grid, doom.MAX_VIEW_DISTANCE)
+
+def test_flat_and_chunked_levels_cast_the_same_distances(tmp_path):
+    # A mostly open level, so many rays would see walls well past the view distance
+    flat = levels.generate_level(200, 200, 0.002, seed=4)
+    filepath = str(tmp_path / 'open.pdl')
+    levels.save_binary(flat, filepath, chunked=True)
+    chunked = levels.load_binary(filepath)
+    assert isinstance(chunked, game_map.ChunkedMap)
+
+    projection = camera.Camera(doom.SCREEN_WIDTH, doom.SCREEN_HEIGHT, 1)
+    picker = random.Random(9)
+    for _ in range(30):
+        x, y = picker.uniform(1, 199), picker.uniform(1, 199)
+        if not flat.is_passable(int(x), int(y)):
+            continue
+        angle = picker.uniform(0, 2 * math.pi)
+        flat_view = cast_view(flat, x, y, angle, projection)
+        chunked_view = cast_view(chunked, x, y, angle, projection)
+        for flat_values, chunked_values in zip(flat_view, chunked_view):
+            assert np.array_equal(flat_values, chunked_values)
+        assert flat_view[0].max() <= doom.MAX_VIEW_DISTANCE
+
+        # The single-ray caster reads the current map
+        doom.player.x, doom.player.y = x, y
+        game_map.set_current_map(flat)
+        flat_cast = doom.ray_cast(angle)
+        game_map.set_current_map(chunked)
+        assert doom.ray_cast(angle) == flat_cast
+        assert flat_cast[0] <= doom.MAX_VIEW_DISTANCE
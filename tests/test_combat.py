@@ -0,0 +1,45 @@
+"""
+Tests for combat. Looking enemies up through the spatial index has to hit the same enemy as testing every one.
+"""
+
+import math
+import random
+import combat
+import levels
+import raycast
+import spatial
+
+class Target:
+    """Stand-in for an enemy, only its position is used."""
+
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+def test_find_target_matches_brute_force():
+    world = levels.generate_level(24, 24, 0.2, seed=11)
+    picker = random.Random(13)
+    empty = [(x, y) for y in range(world.height) for x in range(world.width) if world.is_passable(x, y)]
+    radius = combat.billboard_radius(328, 488, 400, 360, math.pi / 2)
+
+    for _ in range(20):
+        index = spatial.SpatialHash()
+        targets = []
+        for x, y in picker.sample(empty, 15):
+            target = Target(x + picker.random(), y + picker.random())
+            index.insert(target)
+            targets.append(target)
+        origin_x, origin_y = picker.choice(empty)
+        origin_x, origin_y = origin_x + picker.random(), origin_y + picker.random()
+
+        for angle in [picker.uniform(0, 2 * math.pi) for _ in range(40)]:
+            wall_distance, _ = raycast.cast_ray(origin_x, origin_y, angle, world.tiles, 100.0)
+            hits = [combat.hit_distance(target, radius, origin_x, origin_y, math.cos(angle), math.sin(angle))
+                    for target in targets]
+            expected = min((hit for hit in hits if hit is not None and hit < wall_distance), default=None)
+
+            found = combat.find_target(world, index, origin_x, origin_y, angle, 100.0, lambda target: radius, radius)
+            if expected is None:
+                assert found is None
+            else:
+                assert hits[targets.index(found)] == expected
@@ -0,0 +1,40 @@
+"""
+Tests for framebuffer. The sliced drawing has to match masking every pixel of the screen.
+"""
+
+import numpy as np
+import framebuffer
+
+def test_draw_columns_matches_mask():
+    rng = np.random.default_rng(1)
+    for column_width in (1, 3, 7):
+        count = -(-40 // column_width) - (column_width == 7)
+        tops = rng.uniform(-5, 30, count)
+        bottoms = tops + rng.uniform(-5, 40, count)
+        colors = rng.integers(0, 256, (count, 3), dtype=np.uint8)
+        frame = framebuffer.FrameBuffer(40, 30)
+        frame.draw_columns(column_width, tops, bottoms, colors)
+
+        pixel_columns = np.minimum(np.arange(40) // column_width, count - 1)
+        rows = np.arange(30)[:, None]
+        mask = (rows >= tops[pixel_columns]) & (rows < bottoms[pixel_columns])
+        expected = np.zeros((30, 40, 3), dtype=np.uint8)
+        expected[mask] = np.broadcast_to(colors[pixel_columns], expected.shape)[mask]
+        assert (frame.pixels == expected).all()
+
+def test_draw_image_skips_transparent_and_hidden_pixels():
+    rng = np.random.default_rng(2)
+    texture = rng.integers(0, 256, (9, 6, 4), dtype=np.uint8)
+    texture[::2, :, 3] = 0
+    depth_buffer = rng.uniform(0, 10, 40)
+    frame = framebuffer.FrameBuffer(40, 30)
+    frame.fill((1, 2, 3))
+    frame.draw_image(texture, -3.5, 2.25, 27, 31, 5.0, depth_buffer)
+
+    for y in range(30):
+        for x in range(40):
+            source_y, source_x = int((y - 2.25) * 9 / 31), int((x + 3.5) * 6 / 27)
+            inside = x < int(-3.5 + 27) and y < int(2.25 + 31) and y >= 2
+            pixel = texture[min(source_y, 8), min(source_x, 5)]
+            drawn = inside and pixel[3] > 0 and depth_buffer[x] > 5.0
+            assert tuple(frame.pixels[y, x]) == (tuple(pixel[:3]) if drawn else (1, 2, 3))
@@ -0,0 +1,45 @@
+"""
+Tests for hpa and the A* fallback used while its cluster graph is being built.
+"""
+
+import constants
+import game_map
+import hpa
+import levels
+import pathfinding
+
+def test_tile_change_marks_graph_incomplete():
+    world = levels.generate_level(64, 64, seed=5)
+    game_map.set_current_map(world)
+    path_finder = hpa.HierarchicalPathfinder()
+    assert path_finder.build()
+    assert path_finder.complete
+
+    world.set_tile(20, 20, constants.PosColor.LIGHTWALL)
+    assert not path_finder.build(0)
+    assert not path_finder.complete
+    assert path_finder.build()
+    assert path_finder.complete
+
+    path_finder.tile_changed(40, 40)
+    assert not path_finder.complete
+
+def test_build_starts_around_cell():
+    game_map.set_current_map(levels.generate_level(128, 128, seed=5))
+    path_finder = hpa.HierarchicalPathfinder()
+    assert not path_finder.build(9, around=(70, 70))
+    assert set(path_finder.clusters) == {(x, y) for x in range(3, 6) for y in range(3, 6)}
+
+def test_fallback_is_windowed_until_graph_is_complete():
+    world = levels.generate_level(128, 128, wall_density=0, seed=5)
+    # The only way through the wall is far outside the box around the start and goal
+    for y in range(1, 127):
+        if y != 100:
+            world.set_tile(20, y, constants.PosColor.LIGHTWALL)
+    game_map.set_current_map(world)
+    finder = pathfinding.EnemyPathfinding()
+    assert finder.find_hpa_path((10, 10), (30, 10)) is None
+    assert finder.find_hpa_path((10, 10), (12, 14))[-1] == (12, 14)
+
+    finder.path_finder.build()
+    assert finder.find_hpa_path((10, 10), (30, 10)) is not None
@@ -0,0 +1,18 @@
+"""
+Tests for image_utils. Pixels written with encode_png have to decode back unchanged.
+"""
+
+import numpy as np
+import image_utils
+
+def test_png_round_trip(tmp_path):
+    picker = np.random.default_rng(3)
+    rgba = picker.integers(0, 256, (7, 5, 4), dtype=np.uint8)
+    image_utils.encode_png(str(tmp_path / 'rgba.png'), rgba)
+    assert (image_utils.decode_png(str(tmp_path / 'rgba.png')) == rgba).all()
+
+    rgb = rgba[:, :, :3]
+    image_utils.encode_png(str(tmp_path / 'rgb.png'), rgb)
+    decoded = image_utils.decode_png(str(tmp_path / 'rgb.png'))
+    assert (decoded[:, :, :3] == rgb).all() and (decoded[:, :, 3] == 255).all()
+    assert image_utils.get_png_dimensions(str(tmp_path / 'rgb.png')) == (5, 7)
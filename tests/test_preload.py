@@ -0,0 +1,21 @@
+"""
+Tests for preload. A failing asset has to be reported without losing the ones that finished alongside it.
+"""
+
+import preload
+
+def fail():
+    raise OSError('missing file')
+
+def test_finished_reports_each_failure():
+    loader = preload.AssetLoader(2)
+    loader.submit('good', lambda: 1)
+    loader.submit('bad', fail)
+    loader.submit('also good', lambda: 2)
+    loader.executor.shutdown(wait=True)
+
+    results = {name: (result, error) for name, result, error in loader.finished()}
+    assert results['good'] == (1, None)
+    assert results['also good'] == (2, None)
+    assert results['bad'][0] is None and isinstance(results['bad'][1], OSError)
+    assert loader.done()
@@ -0,0 +1,47 @@
+"""
+Tests for raycast. The batched caster has to give every ray the same hit as casting it on its own.
+"""
+
+import math
+import random
+import numpy as np
+import constants
+import levels
+import raycast
+
+def random_origins(world, count: int, seed: int):
+    """Pick random points inside empty cells of a map."""
+    picker = random.Random(seed)
+    empty = [(x, y) for y in range(world.height) for x in range(world.width) if world.is_passable(x, y)]
+    for _ in range(count):
+        x, y = picker.choice(empty)
+        yield x + picker.random(), y + picker.random()
+
+def test_batched_matches_scalar():
+    world = levels.generate_level(48, 48, 0.3, seed=3)
+    picker = random.Random(7)
+    for origin_x, origin_y in random_origins(world, 40, seed=5):
+        # Axis-aligned and diagonal rays step exactly through cell corners and along grid lines
+        angles = [picker.uniform(-math.pi, 3 * math.pi) for _ in range(60)] + [i * math.pi / 4 for i in range(8)]
+        distances, wall_types, _ = raycast.cast_rays(origin_x, origin_y, angles, world.tiles, 20.0)
+        for angle, distance, wall_type in zip(angles, distances.tolist(), wall_types.tolist()):
+            assert raycast.cast_ray(origin_x, origin_y, angle, world.tiles, 20.0) == (distance, wall_type)
+
+def test_walk_cells_reaches_the_hit_wall():
+    world = levels.generate_level(32, 32, 0.3, seed=11)
+    picker = random.Random(2)
+    for origin_x, origin_y in random_origins(world, 20, seed=13):
+        angle = picker.uniform(0, 2 * math.pi)
+        distance, wall_type = raycast.cast_ray(origin_x, origin_y, angle, world.tiles, 100.0)
+        for cell_x, cell_y, entry in raycast.walk_cells(origin_x, origin_y, angle, 100.0):
+            if world.tiles[cell_y, cell_x] != constants.PosColor.EMPTY.value:
+                break
+        assert world.tiles[cell_y, cell_x] == wall_type
+        assert math.isclose(entry, distance, rel_tol=1e-3, abs_tol=1e-6)
+
+def test_rays_leaving_the_grid_hit_nothing():
+    grid = np.zeros((5, 5), dtype=np.uint8)
+    distances, wall_types, _ = raycast.cast_rays(2.5, 2.5, [0.0, 1.0, 2.0], grid, 20.0)
+    assert distances.tolist() == [20.0, 20.0, 20.0]
+    assert wall_types.tolist() == [constants.PosColor.LIGHTWALL.value] * 3
+    assert raycast.cast_ray(2.5, 2.5, 1.0, grid, 20.0) == (20.0, constants.PosColor.LIGHTWALL.value)
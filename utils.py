@@ -1,15 +1,14 @@
-import constants
-import struct
-from typing import Tuple
+import game_map
 
 def pack(pos):
-    return pos[0] * constants.MAP_DIMENSIONS + pos[1]
+    return pos[1] * game_map.current_map().width + pos[0]
 
 def unpack(packed):
-    return (packed // constants.MAP_DIMENSIONS, packed % constants.MAP_DIMENSIONS)
+    width = game_map.current_map().width
+    return (packed % width, packed // width)
 
 def distance(pos1, pos2):
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
 def is_inside_map(pos):
-    return pos[0] >= 0 and pos[0] < constants.MAP_DIMENSIONS and pos[1] >= 0 and pos[1] < constants.MAP_DIMENSIONS
\ No newline at end of file
+    return game_map.current_map().contains(pos[0], pos[1])
\ No newline at end of file